@@ -6,6 +6,9 @@ import PySide6.QtWidgets as qw
 
 from query import Query
 
+# Pages are fetched column by column and only visible cells are formatted, so large pages stay responsive
+MAX_ROWS_PER_PAGE = 50000
+
 
 class PageSelector(qw.QWidget):
 
@@ -14,8 +17,9 @@ class PageSelector(qw.QWidget):
         self.rows_label = qw.QLabel("Rows per page")
         self.rows_lineedit = qw.QLineEdit()
         self.rows_lineedit.setText("10")
-        self.rows_lineedit.setValidator(qg.QIntValidator(1, 100))
-        self.rows_lineedit.textChanged.connect(self.set_rows_per_page)
+        self.rows_lineedit.setValidator(qg.QIntValidator(1, MAX_ROWS_PER_PAGE))
+        # Applied once typed, rather than running a query for every digit
+        self.rows_lineedit.editingFinished.connect(self.set_rows_per_page)
 
         self.spacer = qw.QSpacerItem(
             40, 20, qw.QSizePolicy.Policy.Expanding, qw.QSizePolicy.Policy.Minimum
@@ -31,6 +35,10 @@ class PageSelector(qw.QWidget):
         self.page_lineedit.setValidator(qg.QIntValidator(1, 1))
         self.page_lineedit.textChanged.connect(self.set_page)
         self.page_count_label = qw.QLabel("out of (unknown)")
+        self.row_count_label = qw.QLabel()
+        self.count_progress_bar = qw.QProgressBar()
+        self.count_progress_bar.setMaximumWidth(100)
+        self.count_progress_bar.setVisible(False)
         self.next_button = qw.QPushButton(">")
         self.next_button.clicked.connect(self.goto_next_page)
         self.last_page_button = qw.QPushButton(">>")
@@ -39,6 +47,7 @@ class PageSelector(qw.QWidget):
         self.query = query
 
         self.query.query_changed.connect(self.update_page_selector)
+        self.query.count_changed.connect(self.update_page_selector)
 
         self.query_string = query.count_query()
 
@@ -48,6 +57,8 @@ class PageSelector(qw.QWidget):
         layout = qw.QHBoxLayout()
         layout.addWidget(self.rows_label)
         layout.addWidget(self.rows_lineedit)
+        layout.addWidget(self.row_count_label)
+        layout.addWidget(self.count_progress_bar)
         layout.addItem(self.spacer)
         layout.addWidget(self.first_page_button)
         layout.addWidget(self.prev_button)
@@ -81,7 +92,27 @@ class PageSelector(qw.QWidget):
         self.page_lineedit.setValidator(
             qg.QIntValidator(1, self.query.get_page_count())
         )
-        self.page_count_label.setText(f"out of {self.query.get_page_count()}")
+        rows = self.query.get_row_count_so_far()
+        if self.query.is_counting():
+            done, total = self.query.get_count_progress()
+            self.page_count_label.setText(
+                f"out of at least {self.query.get_page_count()}"
+            )
+            self.row_count_label.setText(f"at least {rows} rows")
+            self.count_progress_bar.setRange(0, total)
+            self.count_progress_bar.setValue(done)
+            self.count_progress_bar.setVisible(True)
+        elif not self.query.is_count_exact():
+            # Counting failed part way, see Query.get_errors
+            self.page_count_label.setText(
+                f"out of at least {self.query.get_page_count()}"
+            )
+            self.row_count_label.setText(f"at least {rows} rows")
+            self.count_progress_bar.setVisible(False)
+        else:
+            self.page_count_label.setText(f"out of {self.query.get_page_count()}")
+            self.row_count_label.setText(f"{rows} rows")
+            self.count_progress_bar.setVisible(False)
 
         self.page_lineedit.blockSignals(False)
         self.rows_lineedit.blockSignals(False)
@@ -89,5 +120,7 @@ class PageSelector(qw.QWidget):
     def set_page(self, page):
         self.query.set_page(int(page) if page else 1)
 
-    def set_rows_per_page(self, rows_per_page):
-        self.query.set_limit(int(rows_per_page or 10))
+    def set_rows_per_page(self):
+        rows_per_page = int(self.rows_lineedit.text() or 10)
+        if rows_per_page != self.query.get_limit():
+            self.query.set_limit(rows_per_page)
@@ -1,4 +1,7 @@
 import typing
+from pathlib import Path
+
+import PySide6.QtCore as qc
 
 
 def dict_add_value(d: dict, key: str, value: typing.Any):
@@ -16,3 +19,50 @@ def dict_add_value(d: dict, key: str, value: typing.Any):
         dict_add_value(d[key], sub_key, value)
     else:
         d[key] = value
+
+
+def dict_flatten(
+    d: dict, prefix: str = ""
+) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """Inverse of dict_add_value: lazily yield (key, value) pairs of an arbitrarly nested dictionary,
+    with keys of nested values joined by dots
+
+    Args:
+        d (dict): the dictionnary to flatten
+        prefix (str, optional): key of d in its parent dictionnary, if any
+
+    Yields:
+        Tuple[str, Any]: dotted key and value of every leaf
+    """
+    for key, value in d.items():
+        key = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            yield from dict_flatten(value, key)
+        else:
+            yield key, value
+
+
+def cache_dir(name: str) -> Path:
+    """Get (and create) a subdirectory of the application cache directory
+
+    Args:
+        name (str): name of the subdirectory
+
+    Returns:
+        Path: the subdirectory
+    """
+    path = (
+        Path(
+            qc.QStandardPaths.writableLocation(
+                qc.QStandardPaths.StandardLocation.CacheLocation
+            )
+        )
+        / name
+    )
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def sql_string(value: str) -> str:
+    """Quote a python string as a SQL string literal"""
+    return "'" + value.replace("'", "''") + "'"
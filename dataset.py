@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+import glob
+import os
+import urllib.parse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import duckdb as db
+import polars as pl
+
+import engine
+import remote
+
+PARTITION_FILE_COLUMN = "__file"
+
+
+def is_glob(source: str) -> bool:
+    return any(c in source for c in "*?[")
+
+
+def expand_sources(sources: List[Union[str, Path]]) -> List[Union[str, Path]]:
+    """Turn a list of files, directories, glob patterns and URLs into a sorted list of parquet files
+
+    Args:
+        sources (List[Union[str, Path]]): what the user opened
+
+    Returns:
+        List[Union[str, Path]]: every parquet file found, without duplicates. Remote files are kept as URL strings.
+    """
+    files = []
+    for source in sources:
+        source = str(source)
+        if remote.is_remote(source):
+            remote.setup(engine.cursor())
+            files.append(source)
+        elif is_glob(source):
+            files.extend(Path(f) for f in glob.glob(source, recursive=True))
+        elif Path(source).is_dir():
+            files.extend(Path(source).rglob("*.parquet"))
+        else:
+            files.append(Path(source))
+    return sorted(
+        set(f for f in files if isinstance(f, str) or not f.is_dir()), key=str
+    )
+
+
+def fingerprint(file: Union[str, Path]) -> Tuple[int, int]:
+    """Cheap identity of a file's content: modification time and size"""
+    if remote.is_remote(file):
+        return remote.fingerprint(str(file))
+    st = os.stat(file)
+    return st.st_mtime_ns, st.st_size
+
+
+def exists(file: Union[str, Path]) -> bool:
+    # Remote files are checked by fingerprint when the dataset is (re)loaded
+    return remote.is_remote(file) or Path(file).exists()
+
+
+def directory_parts(file: Union[str, Path]) -> Tuple[str, ...]:
+    if remote.is_remote(file):
+        return Path(urllib.parse.urlparse(str(file)).path).parent.parts
+    return Path(file).parent.parts
+
+
+def run_name(file: Union[str, Path]) -> str:
+    """Same as string_split(parse_filename(filename, true), '.')[1] in DuckDB, but computed once per file"""
+    return Path(file).name.split(".")[0]
+
+
+def _parse_partition_value(values: List[str]) -> pl.Series:
+    for cast in (int, float):
+        try:
+            return pl.Series([cast(v) for v in values])
+        except ValueError:
+            pass
+    return pl.Series(values)
+
+
+def hive_partitions(files: List[Path]) -> Optional[pl.DataFrame]:
+    """Read hive partition keys (key=value directories) from the file paths
+
+    Only keys that are present in every file are kept, and their values are typed the same way
+    for every file (integer, then float, then string).
+
+    Args:
+        files (List[Path]): the files of the dataset
+
+    Returns:
+        Optional[pl.DataFrame]: one row per file, with the file path in the __file column and one column per
+        partition key. None if the files are not partitioned.
+    """
+    if not files:
+        return None
+    parsed = []
+    for f in files:
+        parts = {}
+        for part in directory_parts(f):
+            if "=" in part:
+                key, value = part.split("=", 1)
+                parts[key] = value
+        parsed.append(parts)
+
+    keys = [k for k in parsed[0] if all(k in p for p in parsed)]
+    if not keys:
+        return None
+
+    return pl.DataFrame(
+        {
+            PARTITION_FILE_COLUMN: [str(f) for f in files],
+            **{k: _parse_partition_value([p[k] for p in parsed]) for k in keys},
+        }
+    )
+
+
+def partition_keys(partitions: Optional[pl.DataFrame]) -> List[str]:
+    if partitions is None:
+        return []
+    return [c for c in partitions.columns if c != PARTITION_FILE_COLUMN]
+
+
+def prune_files(
+    files: List[Path], partitions: Optional[pl.DataFrame], filters: List[str]
+) -> List[Path]:
+    """Drop the files whose partition values can't match the filters, before any of them is opened
+
+    Filters are tried one by one against the partition table. A filter that references anything else than
+    partition columns fails to bind and is left for DuckDB to apply on the actual rows.
+
+    Args:
+        files (List[Path]): all the files of the dataset
+        partitions (Optional[pl.DataFrame]): as returned by hive_partitions
+        filters (List[str]): SQL conditions, as stored in the query
+
+    Returns:
+        List[Path]: the files that may contain matching rows
+    """
+    if partitions is None or not filters:
+        return files
+    kept = partitions
+    for f in filters:
+        try:
+            kept = engine.cursor().from_arrow(kept.to_arrow()).filter(f).pl()
+        except db.Error:
+            continue
+    kept_files = set(kept[PARTITION_FILE_COLUMN])
+    return [f for f in files if str(f) in kept_files]
+
+
+def revalidate(
+    sources: List[str], fingerprints: Dict[str, List[int]], progress=None
+) -> Tuple[List[Path], Dict[str, Tuple[int, int]], bool]:
+    """Look for the files of saved sources again, and tell whether they changed since they were saved
+
+    Args:
+        sources (List[str]): saved sources
+        fingerprints (Dict[str, List[int]]): saved fingerprint of every file
+        progress (Callable, optional): unused, for engine.Worker
+
+    Returns:
+        Tuple[List[Path], Dict[str, Tuple[int, int]], bool]: the files that exist now, their fingerprints, and
+        whether they are exactly the saved ones
+    """
+    files = expand_sources(sources)
+    current = {}
+    for f in list(files):
+        try:
+            current[str(f)] = fingerprint(f)
+        except OSError:
+            files.remove(f)
+    unchanged = current == {f: tuple(fp) for f, fp in fingerprints.items()}
+    return files, current, unchanged
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import os
+from pathlib import Path
+from typing import List
+
+import PySide6.QtCore as qc
+
+import dataset
+import remote
+
+# Pipelines write files in bursts, wait for them to settle before refreshing
+DEBOUNCE_MS = 1000
+
+
+class DatasetWatcher(qc.QObject):
+    """Tell when files are added to, changed in or removed from the directories of a dataset"""
+
+    changed = qc.Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.watcher = qc.QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule)
+        self.watcher.fileChanged.connect(self.schedule)
+
+        self.timer = qc.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_MS)
+        self.timer.timeout.connect(self.changed)
+
+    def schedule(self, _):
+        self.timer.start()
+
+    def watch(self, sources: List[str], files: List[Path]):
+        """Watch the given files, and every directory where new files of the dataset could appear"""
+        # Remote files can't be watched, they are checked when the dataset is refreshed
+        paths = set(str(f) for f in files if not remote.is_remote(f))
+        for source in sources:
+            if remote.is_remote(source):
+                continue
+            if dataset.is_glob(source):
+                parts = Path(source).parts
+                fixed = 0
+                while not dataset.is_glob(parts[fixed]):
+                    fixed += 1
+                root = Path(*parts[:fixed]) if fixed else Path(".")
+                # Wildcards in directory names match directories that may not exist yet
+                recursive = fixed < len(parts) - 1
+            elif Path(source).is_dir():
+                root, recursive = Path(source), True
+            else:
+                root, recursive = Path(source).parent, False
+            if not root.is_dir():
+                continue
+            paths.add(str(root))
+            if recursive:
+                for d, _, _ in os.walk(root):
+                    paths.add(d)
+
+        current = set(self.watcher.files() + self.watcher.directories())
+        if current - paths:
+            self.watcher.removePaths(list(current - paths))
+        if paths - current:
+            self.watcher.addPaths(list(paths - current))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
+
+import duckdb as db
+import PySide6.QtCore as qc
+
+
+# Priorities of the workers queued in the thread pool: the visible tab's queries go first
+VISIBLE_PRIORITY = 1
+BACKGROUND_PRIORITY = 0
+
+
+class WorkerSignals(qc.QObject):
+
+    finished = qc.Signal(object)
+    error = qc.Signal(str)
+    progress = qc.Signal(object)
+
+
+class Worker(qc.QRunnable):
+    """Run a function in the global thread pool and report back through Qt signals
+
+    The function is called with an extra `progress` keyword argument, a callable that emits the progress signal.
+    """
+
+    def __init__(self, fn: Callable, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.fn(
+                *self.args, progress=self.signals.progress.emit, **self.kwargs
+            )
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+def start(worker: Worker, priority: int = VISIBLE_PRIORITY) -> Worker:
+    """Queue a worker, once its signals are connected
+
+    The thread pool is shared by all the tabs. Queued workers with a higher priority are started first.
+    """
+    qc.QThreadPool.globalInstance().start(worker, priority)
+    return worker
+
+
+_local = threading.local()
+
+
+def cursor() -> db.DuckDBPyConnection:
+    """Connection to the shared in-memory database for the calling thread
+
+    DuckDB connections can't be used from several threads at once, but cursors of the same database can.
+    """
+    if not hasattr(_local, "cursor"):
+        _local.cursor = db.cursor()
+    return _local.cursor
+
+
+_executor = ThreadPoolExecutor(thread_name_prefix="fan_out")
+
+
+def fan_out(fn: Callable, items: List) -> List[Any]:
+    """Call fn on every item in parallel and wait for all of them
+
+    Returns:
+        List[Any]: results in the order of items, or the exception raised for an item
+    """
+    futures = [_executor.submit(fn, item) for item in items]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
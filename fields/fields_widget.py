@@ -2,7 +2,6 @@
 
 from typing import List
 
-import polars as pl
 import PySide6.QtCore as qc
 import PySide6.QtGui as qg
 import PySide6.QtWidgets as qw
@@ -37,6 +36,9 @@ class FieldsWidget(qw.QWidget):
         self.remove_button = qw.QPushButton("Remove")
         self.move_up_button = qw.QPushButton("Move up")
         self.move_down_button = qw.QPushButton("Move down")
+        self.group_by_button = qw.QPushButton("Group by")
+        self.aggregate_button = qw.QPushButton("Aggregate")
+        self.ungroup_button = qw.QPushButton("Ungroup")
 
         layout = qw.QVBoxLayout()
         layout.addWidget(self.view)
@@ -44,6 +46,9 @@ class FieldsWidget(qw.QWidget):
         layout.addWidget(self.remove_button)
         layout.addWidget(self.move_up_button)
         layout.addWidget(self.move_down_button)
+        layout.addWidget(self.group_by_button)
+        layout.addWidget(self.aggregate_button)
+        layout.addWidget(self.ungroup_button)
 
         self.setLayout(layout)
 
@@ -51,6 +56,9 @@ class FieldsWidget(qw.QWidget):
         self.remove_button.clicked.connect(self.remove_field)
         self.move_up_button.clicked.connect(self.move_up)
         self.move_down_button.clicked.connect(self.move_down)
+        self.group_by_button.clicked.connect(self.group_by)
+        self.aggregate_button.clicked.connect(self.aggregate)
+        self.ungroup_button.clicked.connect(self.ungroup)
 
         self.query = query
 
@@ -60,13 +68,55 @@ class FieldsWidget(qw.QWidget):
                 self, "No file selected", "Please select a file first"
             )
             return
-        available_fields = pl.scan_parquet(self.query.files).columns
+        available_fields = self.query.get_available_fields()
         dialog = StringListChooser(available_fields, self)
         if dialog.exec() == qw.QDialog.DialogCode.Accepted:
             selected_fields = dialog.get_selected()
             for field in selected_fields:
                 self.model.add_field(field)
 
+    def group_by(self):
+        if not self.query.files:
+            qw.QMessageBox.warning(
+                self, "No file selected", "Please select a file first"
+            )
+            return
+        dialog = StringListChooser(
+            ["run_name"] + self.query.get_available_fields(), self
+        )
+        if dialog.exec() == qw.QDialog.DialogCode.Accepted:
+            self.query.set_group_by(dialog.get_selected(), self.query.get_aggregates())
+
+    def aggregate(self):
+        if not self.query.files:
+            qw.QMessageBox.warning(
+                self, "No file selected", "Please select a file first"
+            )
+            return
+        fields = [
+            s.data(qc.Qt.ItemDataRole.DisplayRole) for s in self.view.selectedIndexes()
+        ]
+        if not fields:
+            dialog = StringListChooser(self.query.get_available_fields(), self)
+            if dialog.exec() != qw.QDialog.DialogCode.Accepted:
+                return
+            fields = dialog.get_selected()
+        function, ok = qw.QInputDialog.getItem(
+            self,
+            "Aggregate",
+            "Function",
+            self.query.get_aggregate_functions(fields),
+            editable=False,
+        )
+        if ok and fields:
+            self.query.set_group_by(
+                self.query.get_group_by(),
+                self.query.get_aggregates() + [(function, f) for f in fields],
+            )
+
+    def ungroup(self):
+        self.query.set_group_by([], [])
+
     def remove_field(self):
         selected = self.view.selectedIndexes()
         if selected:
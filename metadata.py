@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pyarrow.parquet as pq
+
+import dataset
+import engine
+import remote
+from commons import sql_string
+
+# Row counts read from parquet footers, by file and fingerprint
+_row_counts: Dict[Tuple[str, Tuple[int, int]], int] = {}
+
+# DuckDB types that sum, avg and the like accept
+NUMERIC_TYPES = {
+    "TINYINT",
+    "SMALLINT",
+    "INTEGER",
+    "BIGINT",
+    "HUGEINT",
+    "UTINYINT",
+    "USMALLINT",
+    "UINTEGER",
+    "UBIGINT",
+    "UHUGEINT",
+    "FLOAT",
+    "DOUBLE",
+}
+
+# Column names and types, by file and fingerprint
+_schemas: Dict[Tuple[str, Tuple[int, int]], Dict[str, str]] = {}
+
+
+def _key(file: Union[str, Path]) -> Tuple[str, Tuple[int, int]]:
+    if remote.is_remote(file):
+        # The server is asked again only when the dataset is refreshed
+        return str(file), remote.fingerprint(str(file), refresh=False)
+    return str(file), dataset.fingerprint(file)
+
+
+def row_count(file: Union[str, Path]) -> int:
+    """Number of rows of a parquet file, read from its footer only
+
+    Cached until the file changes (see dataset.fingerprint). Footers of remote files are read through the
+    block cache.
+    """
+    key = _key(file)
+    if key not in _row_counts and remote.is_remote(file):
+        with remote.RangeReader(str(file)) as f:
+            _row_counts[key] = pq.read_metadata(f).num_rows
+    elif key not in _row_counts:
+        _row_counts[key] = (
+            engine.cursor()
+            .sql(
+                f"SELECT COALESCE(SUM(num_rows), 0) FROM (SELECT DISTINCT row_group_id, row_group_num_rows AS num_rows FROM parquet_metadata({sql_string(str(file))}))"
+            )
+            .fetchone()[0]
+        )
+    return _row_counts[key]
+
+
+def schema(file: Union[str, Path]) -> Dict[str, str]:
+    """DuckDB type of every column of a parquet file, by name"""
+    key = _key(file)
+    if key not in _schemas:
+        rows = (
+            engine.cursor()
+            .sql(f"DESCRIBE SELECT * FROM read_parquet({sql_string(str(file))})")
+            .fetchall()
+        )
+        _schemas[key] = {row[0]: row[1] for row in rows}
+    return _schemas[key]
+
+
+def is_numeric(column_type: str) -> bool:
+    """Whether a type returned by schema holds numbers"""
+    return column_type in NUMERIC_TYPES or column_type.startswith("DECIMAL")
+
+
+def cached_row_count(
+    file: Union[str, Path], fingerprint: Tuple[int, int]
+) -> Optional[int]:
+    """Row count read earlier for this version of the file, if any (without touching the file)"""
+    return _row_counts.get((str(file), fingerprint))
+
+
+def invalidate(files: List[Union[str, Path]]):
+    """Forget everything read from these files"""
+    files = set(str(f) for f in files)
+    for cache in (_row_counts, _schemas):
+        for key in [k for k in cache if k[0] in files]:
+            del cache[key]
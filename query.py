@@ -1,17 +1,108 @@
 #!/usr/bin/env python
 
+import math
+import threading
+from functools import partial
 from pathlib import Path
 from typing import List, Tuple
 
 import duckdb as db
 import polars as pl
 import PySide6.QtCore as qc
-from cachetools import cached
-
-
-@cached(cache={})
-def run_sql(query: str) -> List[dict]:
-    return db.sql(query).pl().to_dicts()
+from cachetools import LRUCache, cached
+
+import dataset
+import engine
+import metadata
+import search_index
+from commons import sql_string
+from dataset_watcher import DatasetWatcher
+
+# Files counted by a single COUNT(*) query when counting rows in the background
+COUNT_BATCH_SIZE = 16
+
+# Files per shard when large file sets are split (see Query.set_sharded)
+SHARD_SIZE = 64
+
+# Columns fetched with a page before the view tells which ones are visible
+INITIAL_COLUMNS = 20
+
+# Memory used by the columns of pages kept around (in bytes), see Query.load_columns
+COLUMN_CACHE_BYTES = 256 << 20
+
+# Memory used by the cached results of run_sql (groups, sharded pages), in bytes
+RESULT_CACHE_BYTES = 256 << 20
+
+# Where the row numbers of a sorted page are cached, next to its columns
+PAGE_ROWS = "__page_rows"
+
+# Total row counts, by count query
+_counts = {}
+
+# run_sql is called from the fan out threads too
+_run_sql_lock = threading.RLock()
+
+# Aggregate functions available in group by mode, as SQL templates
+AGGREGATES = {
+    "count": "count({})",
+    "count distinct": "count(DISTINCT {})",
+    "sum": "sum({})",
+    "avg": "avg({})",
+    "min": "min({})",
+    "max": "max({})",
+    "median": "median({})",
+}
+
+# Aggregate functions that only apply to numeric fields
+NUMERIC_AGGREGATES = {"sum", "avg", "median"}
+
+
+@cached(
+    cache=LRUCache(maxsize=RESULT_CACHE_BYTES, getsizeof=lambda f: f.estimated_size()),
+    lock=_run_sql_lock,
+)
+def run_sql(query: str) -> pl.DataFrame:
+    return engine.cursor().sql(query).pl()
+
+
+def invalidate_cached_results(files: List[str]):
+    """Drop the cached pages, groups and counts of queries reading any of these files"""
+    quoted = [f"'{f}'" for f in files]
+    with _run_sql_lock:
+        for key in [k for k in run_sql.cache if any(q in k[0] for q in quoted)]:
+            del run_sql.cache[key]
+    for key in [k for k in _counts if any(q in k for q in quoted)]:
+        del _counts[key]
+
+
+def count_rows_from_footers(files: List[Path], progress=None) -> int:
+    """Count rows file by file, from parquet footers only (no filters to apply)"""
+    total = 0
+    for i, f in enumerate(files):
+        total += metadata.row_count(f)
+        if progress:
+            progress((total, i + 1, len(files)))
+    return total
+
+
+def count_rows_from_queries(queries: List[str], fallback: str, progress=None) -> int:
+    """Run count queries one after the other, reporting the running total
+
+    Args:
+        queries (List[str]): one COUNT(*) query per batch of files
+        fallback (str): COUNT(*) query on all the files at once, used if a batch can't be counted on its own
+        progress (Callable, optional): called with (rows so far, counted batches, total batches)
+    """
+    total = 0
+    for i, query in enumerate(queries):
+        try:
+            total += engine.cursor().sql(query).fetchone()[0]
+        except db.BinderException:
+            # A batch may lack a column that union_by_name finds in the whole dataset
+            return engine.cursor().sql(fallback).fetchone()[0]
+        if progress:
+            progress((total, i + 1, len(queries)))
+    return total
 
 
 class Query(qc.QObject):
@@ -23,13 +114,30 @@ class Query(qc.QObject):
     limit_changed = qc.Signal()
     offset_changed = qc.Signal()
     file_changed = qc.Signal()
+    search_changed = qc.Signal()
+    group_by_changed = qc.Signal()
 
     # Signals for external use
     query_changed = qc.Signal()
+    count_changed = qc.Signal()
+    columns_loaded = qc.Signal()
 
     def __init__(self) -> None:
         super().__init__()
 
+        self.priority = engine.VISIBLE_PRIORITY
+        # Like the menu item it comes from, kept when another dataset is opened
+        self.sharded = False
+
+        self.watcher = DatasetWatcher(self)
+        self.watcher.changed.connect(self.refresh_files)
+
+        # Columns of the pages, by (page_key, column), shared by all the datasets opened in this query
+        self.column_chunks = LRUCache(
+            maxsize=COLUMN_CACHE_BYTES, getsizeof=lambda s: s.estimated_size()
+        )
+        self.visible_columns = None
+
         self.init_state()
 
         self.fields_changed.connect(self.update)
@@ -38,6 +146,8 @@ class Query(qc.QObject):
         self.limit_changed.connect(self.update)
         self.offset_changed.connect(self.update)
         self.file_changed.connect(self.update)
+        self.search_changed.connect(self.update)
+        self.group_by_changed.connect(self.update)
 
     def init_state(self):
         self.fields = []
@@ -45,14 +155,50 @@ class Query(qc.QObject):
         self.order_by = []
         self.limit = 10
         self.offset = 0
+        self.sources = []
         self.files = None
+        self.partitions = None
+        self.scanned_files = []
+        self.run_names = {}
+        self.fingerprints = {}
+        self.revalidate_worker = None
+
+        self.search_text = ""
+        self.search_columns = []
+        self.search_index = None
+        self.search_candidates = None
+
+        self.group_by = []
+        self.aggregates = []
 
         self.current_page = 1
         self.page_count = 1
 
-        self.data = []
+        self.row_count = 0
+        self.counting = False
+        self.count_key = None
+        self.count_token = None
+        self.count_progress = (0, 0)
+        self.count_workers = []
+        self.count_error = None
+        self.page_error = None
+
+        self.shards_pending = 0
+        self.shard_errors = {}
+        self.shard_count_errors = {}
+
+        self.frame = pl.DataFrame()
         self.header = []
 
+    def get_priority(self) -> int:
+        return self.priority
+
+    def set_priority(self, priority: int):
+        """Priority of this query's background work, see engine.start"""
+        self.priority = priority
+
+        return self
+
     def add_field(self, field: str):
         self.fields.append(field)
         self.fields_changed.emit()
@@ -85,12 +231,110 @@ class Query(qc.QObject):
         return self.file
 
     def set_files(self, files: List[Path]):
+        return self.set_sources(files)
+
+    def get_sources(self) -> List[str]:
+        return self.sources
+
+    def set_sources(self, sources: List[str]):
+        """Open a dataset made of parquet files, directories (hive partitioned or not) and glob patterns"""
         self.init_state()
-        self.files = files
+        self.load_sources(sources)
         self.file_changed.emit()
 
         return self
 
+    def load_sources(self, sources: List[str]):
+        self.sources = [str(s) for s in sources]
+        files = dataset.expand_sources(self.sources)
+        self.load_files(files, {str(f): dataset.fingerprint(f) for f in files})
+
+    def load_files(self, files: List[Path], fingerprints: dict):
+        self.files = files
+        self.partitions = dataset.hive_partitions(self.files)
+        self.run_names = {str(f): dataset.run_name(f) for f in self.files}
+        self.fingerprints = fingerprints
+        self.watcher.watch(self.sources, self.files)
+
+    def refresh_files(self):
+        """Pick up the files added, changed or removed since the dataset was opened
+
+        Only what was read from the changed and removed files is invalidated. When the total row count is
+        known, it is updated from the footers of the new files (or a count of the added files only) instead of
+        counting everything again.
+        """
+        files = dataset.expand_sources(self.sources)
+        fingerprints = {str(f): dataset.fingerprint(f) for f in files}
+        added = [f for f in fingerprints if f not in self.fingerprints]
+        removed = [f for f in self.fingerprints if f not in fingerprints]
+        changed = [
+            f
+            for f in fingerprints
+            if f in self.fingerprints and fingerprints[f] != self.fingerprints[f]
+        ]
+        if not (added or removed or changed):
+            return
+
+        row_count = None
+        if not self.counting and self.count_key and not self.is_grouped():
+            row_count = self.row_count
+        old_fingerprints = self.fingerprints
+        old_scanned = set(str(f) for f in self.scanned_files)
+        had_conditions = bool(self.get_conditions())
+
+        self.files = files
+        self.partitions = dataset.hive_partitions(self.files)
+        self.run_names = {str(f): dataset.run_name(f) for f in self.files}
+        self.fingerprints = fingerprints
+        self.watcher.watch(self.sources, self.files)
+        # The search index no longer matches the files, it has to be rebuilt
+        self.search_index = None
+        self.search_candidates = None
+
+        scanned = dataset.prune_files(self.files, self.partitions, self.filters)
+        scanned_set = set(str(f) for f in scanned)
+        if row_count is not None and not had_conditions:
+            for f in removed + changed:
+                old = metadata.cached_row_count(f, old_fingerprints[f])
+                if f in old_scanned and old is None:
+                    row_count = None
+                    break
+                if f in old_scanned:
+                    row_count -= old
+            if row_count is not None:
+                row_count += sum(
+                    metadata.row_count(f) for f in added + changed if f in scanned_set
+                )
+        elif row_count is not None and not (removed or changed):
+            added_scanned = [
+                f for f in self.files if str(f) in added and str(f) in scanned_set
+            ]
+            if added_scanned:
+                row_count += run_sql(self.count_query(added_scanned))["count_star"][0]
+        else:
+            row_count = None
+
+        invalidate_cached_results(removed + changed)
+        metadata.invalidate(removed + changed)
+        # Pages of other files (e.g. other datasets opened in this query) stay cached
+        quoted = [f"'{f}'" for f in removed + changed]
+        for key in [k for k in self.column_chunks if any(q in k[0] for q in quoted)]:
+            del self.column_chunks[key]
+        if row_count is not None:
+            _counts[self.count_query(scanned)] = row_count
+        # The count query text is unchanged when files were only rewritten, so it has to be run (or looked up) again
+        self.count_key = None
+        self.update()
+
+    def get_partition_keys(self) -> List[str]:
+        return dataset.partition_keys(self.partitions)
+
+    def get_available_fields(self) -> List[str]:
+        if not self.files:
+            return []
+        fields = list(metadata.schema(self.files[0]))
+        return fields + [k for k in self.get_partition_keys() if k not in fields]
+
     def add_filter(self, f):
         self.filters.append(f)
         self.filters_changed.emit()
@@ -121,6 +365,112 @@ class Query(qc.QObject):
 
         return self
 
+    def get_string_fields(self) -> List[str]:
+        if not self.files:
+            return []
+        schema = metadata.schema(self.files[0])
+        return [name for name, dtype in schema.items() if dtype == "VARCHAR"]
+
+    def get_search(self) -> Tuple[str, List[str]]:
+        return self.search_text, self.search_columns
+
+    def set_search(self, text: str, columns: List[str], index: str = None):
+        """Search text in the given columns, using the search index attached under the alias index if any"""
+        self.search_text = text
+        self.search_columns = columns
+        self.search_index = index
+        self.current_page = 1
+        self.offset = 0
+        self.search_changed.emit()
+
+        return self
+
+    def get_conditions(self) -> List[str]:
+        conditions = list(self.filters)
+        if self.search_text and self.search_columns:
+            conditions.append(
+                search_index.search_condition(
+                    self.search_text, self.search_columns, self.search_candidates
+                )
+            )
+        return conditions
+
+    def get_group_by(self) -> List[str]:
+        return self.group_by
+
+    def get_aggregate_functions(self, fields: List[str]) -> List[str]:
+        """Aggregate functions (keys of AGGREGATES) that apply to all these fields, given their types"""
+        if all(self.is_numeric_field(f) for f in fields):
+            return list(AGGREGATES)
+        return [f for f in AGGREGATES if f not in NUMERIC_AGGREGATES]
+
+    def is_numeric_field(self, field: str) -> bool:
+        if not self.files:
+            return False
+        types = metadata.schema(self.files[0])
+        if field in types:
+            return metadata.is_numeric(types[field])
+        if self.partitions is not None and field in self.partitions.columns:
+            return self.partitions[field].dtype.is_numeric()
+        return False
+
+    def get_aggregates(self) -> List[Tuple[str, str]]:
+        return self.aggregates
+
+    def set_group_by(self, group_by: List[str], aggregates: List[Tuple[str, str]]):
+        """Show aggregated rows instead of raw ones
+
+        Args:
+            group_by (List[str]): group keys, run_name included
+            aggregates (List[Tuple[str, str]]): (function, field) pairs, function being a key of AGGREGATES.
+            A count of rows per group is always shown.
+        """
+        self.group_by = group_by
+        self.aggregates = aggregates
+        self.current_page = 1
+        self.offset = 0
+        self.group_by_changed.emit()
+
+        return self
+
+    def is_grouped(self) -> bool:
+        return bool(self.group_by or self.aggregates)
+
+    def is_sharded(self) -> bool:
+        return self.sharded
+
+    def set_sharded(self, sharded: bool):
+        """Split large file sets in shards queried in parallel, whose results are merged
+
+        A shard that fails is reported by get_errors, the other shards are still shown.
+        """
+        self.sharded = sharded
+        self.count_key = None
+        self.update()
+
+        return self
+
+    def uses_shards(self) -> bool:
+        return (
+            self.sharded
+            and not self.is_grouped()
+            and len(self.scanned_files) > SHARD_SIZE
+        )
+
+    def get_shards(self) -> List[List[Path]]:
+        return [
+            self.scanned_files[i : i + SHARD_SIZE]
+            for i in range(0, len(self.scanned_files), SHARD_SIZE)
+        ]
+
+    def get_errors(self) -> List[str]:
+        shards = {**self.shard_count_errors, **self.shard_errors}
+        errors = [self.page_error] if self.page_error else []
+        errors += [f"Shard {i + 1}: {message}" for i, message in sorted(shards.items())]
+        if self.count_error:
+            errors.append(f"Count: {self.count_error}")
+        return errors
+
     def get_limit(self) -> int:
         return self.limit
 
@@ -154,7 +504,10 @@ class Query(qc.QObject):
         return self
 
     def next_page(self):
-        if self.current_page < self.page_count:
+        # While rows are being counted (or when counting failed), a full page means there may be more
+        if self.current_page < self.page_count or (
+            not self.is_count_exact() and self.frame.height == self.limit
+        ):
             self.set_page(self.current_page + 1)
 
         return self
@@ -172,93 +525,559 @@ class Query(qc.QObject):
     def get_page_count(self):
         return self.page_count
 
-    def get_data(self):
-        return self.data
+    def get_row_count_so_far(self) -> int:
+        return self.row_count
+
+    def is_counting(self) -> bool:
+        return self.counting
+
+    def is_count_exact(self) -> bool:
+        """Whether the row count is the total, rather than what could be counted before an error"""
+        return (
+            not self.counting and not self.count_error and not self.shard_count_errors
+        )
+
+    def get_count_progress(self) -> Tuple[int, int]:
+        return self.count_progress
+
+    def get_row_count(self) -> int:
+        return self.frame.height
+
+    def get_column_count(self) -> int:
+        return len(self.header)
+
+    def get_value(self, row: int, column: int):
+        """Value of a single cell of the current page, converted to a Python object only when asked for
+
+        Returns None for columns that are not loaded (yet), see set_visible_columns.
+        """
+        name = self.header[column]
+        if name not in self.frame.columns:
+            return None
+        return self.frame[row, name]
+
+    def set_visible_columns(self, columns: List[str]):
+        """Tell which columns the view shows, so that only those are fetched"""
+        self.visible_columns = columns
+        if self.is_grouped() or self.uses_shards() or self.frame.is_empty():
+            # Those pages are fetched whole
+            return
+        try:
+            loaded = self.load_columns(columns)
+        except db.Error as e:
+            # Reported like a page that failed (see update), the columns already shown stay
+            self.page_error = str(e)
+            loaded = True
+        if loaded:
+            self.columns_loaded.emit()
+
+    def page_key(self) -> str:
+        """What identifies the rows of the current page, whatever the columns"""
+        return self.select_query(fields=[])
+
+    def load_columns(self, columns: List[str]) -> bool:
+        """Fetch the columns of the current page that are not cached yet, and put the page together
+
+        Returns:
+            bool: whether any column had to be fetched
+        """
+        key = self.page_key()
+        wanted = ["run_name"] + [c for c in columns if c in self.fields]
+        missing = [c for c in wanted if (key, c) not in self.column_chunks]
+        chunks = {c: self.column_chunks[key, c] for c in wanted if c not in missing}
+        if missing:
+            fields = [c for c in missing if c != "run_name"]
+            if self.order_by:
+                # Sorting the whole dataset again for every batch of columns would be much slower
+                frame = self.fetch_by_page_rows(key, fields)
+            else:
+                frame = engine.cursor().sql(self.select_query(fields=fields)).pl()
+            frame = frame.with_columns(pl.col("run_name").replace(self.run_names))
+            for c in missing:
+                chunks[c] = frame[c]
+                try:
+                    self.column_chunks[key, c] = frame[c]
+                except ValueError:
+                    # Larger than the whole cache, only kept for the current page
+                    pass
+        # Columns loaded earlier for this page stay in it, as long as they are cached
+        for c in self.fields:
+            if c not in chunks and (key, c) in self.column_chunks:
+                chunks[c] = self.column_chunks[key, c]
+        self.frame = pl.DataFrame(
+            [chunks[c] for c in ["run_name"] + self.fields if c in chunks]
+        )
+        return bool(missing)
+
+    def get_page_rows(self, key: str) -> pl.DataFrame:
+        """filename and file_row_number of the rows of the current (sorted) page, in order
+
+        They are fetched once per page, along with the page itself, and cached with its columns.
+        """
+        if (key, PAGE_ROWS) not in self.column_chunks:
+            rows = (
+                engine.cursor()
+                .sql(self.select_query(fields=["file_row_number"]))
+                .pl()
+                .rename({"run_name": "filename"})
+                .with_row_index("__page_row")
+            )
+            self.column_chunks[key, PAGE_ROWS] = rows
+        return self.column_chunks[key, PAGE_ROWS]
+
+    def fetch_by_page_rows(self, key: str, fields: List[str]) -> pl.DataFrame:
+        """Fields of the rows of the current page, read from the page's files only, by row number"""
+        rows = self.get_page_rows(key)
+        files = rows["filename"].unique(maintain_order=True).to_list()
+        if not files:
+            return pl.DataFrame(schema={"run_name": pl.Utf8} | dict.fromkeys(fields))
+        # Fields of other files only are not found by read_parquet, even with union_by_name
+        present = set(self.get_partition_keys())
+        for f in files:
+            present.update(metadata.schema(f))
+        selected = "".join(
+            f',"{f}"' if f in present else f',NULL AS "{f}"' for f in fields
+        )
+        con = engine.cursor()
+        con.register("page_rows", rows.to_arrow())
+        try:
+            return con.sql(
+                f"""SELECT filename AS run_name{selected} FROM {self.source_expression(files, row_number=True)} JOIN page_rows USING (filename, file_row_number) ORDER BY page_rows.__page_row"""
+            ).pl()
+        finally:
+            con.unregister("page_rows")
 
     def get_header(self):
         return self.header
 
-    def select_query(self):
+    def source_expression(self, files: List[Path] = None, row_number: bool = None):
+        files = files if files is not None else self.scanned_files
+        files = "[" + ",".join(f"'{f}'" for f in files) + "]"
+        hive = self.partitions is not None
+        if row_number is None:
+            row_number = self.search_candidates is not None
+        return f"read_parquet({files},union_by_name=True,filename=True,hive_partitioning={hive},file_row_number={row_number})"
 
-        if not self.files:
+    def ensure_fields(self):
+        if not self.fields:
+            self.fields = list(metadata.schema(self.files[0]))[:5]
+
+    def select_query(
+        self,
+        files: List[Path] = None,
+        limit: int = None,
+        offset: int = None,
+        order_columns: bool = False,
+        fields: List[str] = None,
+    ):
+        files = files if files is not None else self.scanned_files
+        limit = limit if limit is not None else self.limit
+        offset = offset if offset is not None else self.offset
+
+        if not files:
             return ""
 
-        if not self.fields:
-            self.fields = pl.scan_parquet(self.files[0]).columns[:5]
+        self.ensure_fields()
 
-        fields = ", ".join(map(lambda s: f'"{s}"', self.fields))
+        fields = fields if fields is not None else self.fields
+        fields = "".join(map(lambda s: f',"{s}"', fields))
 
-        filters = " AND ".join(self.filters)
+        filters = " AND ".join(self.get_conditions())
         order_by = ", ".join(
             [f"{field} {direction}" for field, direction in self.order_by]
         )
 
-        files = "[" + ",".join(f"'{f}'" for f in self.files) + "]"
+        if order_columns:
+            # Sort keys of the rows, for merging shards
+            fields += "".join(
+                f', {field} AS "__order_{i}"'
+                for i, (field, _) in enumerate(self.order_by)
+            )
 
         if filters:
             filters = f"WHERE {filters}"
         if order_by:
-            order_by = f"ORDER BY {order_by}"
-        return f"""SELECT string_split(parse_filename(filename,true),'.')[1] AS run_name,{fields} FROM read_parquet({files},union_by_name=True,filename=True) {filters} {order_by} LIMIT {self.limit} OFFSET {self.offset}"""
+            # Ties are broken so that every column of a page is fetched in the same row order
+            order_by = f"ORDER BY {order_by}, filename, file_row_number"
+        source = self.source_expression(
+            files, self.search_candidates is not None or bool(self.order_by)
+        )
+        # run_name is derived from filename once per file in update, not once per row
+        return f"""SELECT filename AS run_name{fields} FROM {source} {filters} {order_by} LIMIT {limit} OFFSET {offset}"""
+
+    def run_sharded_page(self) -> pl.DataFrame:
+        """Run the page query on every shard in parallel and merge the results
+
+        Returns an empty frame, without any column, when no shard has rows.
+        """
+        shards = self.get_shards()
+        self.shard_errors = {}
+        counts = [_counts.get(self.count_query(shard)) for shard in shards]
+        if not self.order_by and None not in counts:
+            # Rows come shard after shard, only the shards the page falls in are read
+            jobs = []
+            start = 0
+            for i, shard in enumerate(shards):
+                count = counts[i]
+                if start + count > self.offset and start < self.offset + self.limit:
+                    local_offset = max(0, self.offset - start)
+                    jobs.append((i, self.select_query(shard, offset=local_offset)))
+                start += count
+            page_offset = 0
+        else:
+            # Every shard's first offset + limit rows, the page is among them
+            jobs = [
+                (
+                    i,
+                    self.select_query(
+                        shard,
+                        limit=self.offset + self.limit,
+                        offset=0,
+                        order_columns=True,
+                    ),
+                )
+                for i, shard in enumerate(shards)
+            ]
+            page_offset = self.offset
+
+        frames = []
+        results = engine.fan_out(run_sql, [query for _, query in jobs])
+        for (i, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                self.shard_errors[i] = str(result)
+            elif not result.is_empty():
+                frames.append(result)
+        if not frames:
+            return pl.DataFrame()
+
+        frame = pl.concat(frames, how="diagonal_relaxed")
+        order_columns = [c for c in frame.columns if c.startswith("__order_")]
+        if self.order_by and order_columns:
+            # Shards are sorted already, this merges them
+            frame = frame.sort(
+                order_columns,
+                descending=[d.upper() == "DESC" for _, d in self.order_by],
+                nulls_last=True,
+            )
+        frame = frame.drop(order_columns).slice(page_offset, self.limit)
+        return frame.with_columns(pl.col("run_name").replace(self.run_names))
+
+    def group_query(self):
+        """Aggregated rows of all pages, paged in memory by update (see run_sql cache)"""
+        if not self.scanned_files:
+            return ""
 
-    def count_query(self):
-        if not self.files:
+        source = self.source_expression()
+        if "run_name" in self.group_by:
+            # A tiny join rather than computing run_name from filename on every row
+            scanned = set(str(f) for f in self.scanned_files)
+            run_names = ", ".join(
+                f"({sql_string(f)}, {sql_string(r)})"
+                for f, r in self.run_names.items()
+                if f in scanned
+            )
+            source = (
+                f"{source} JOIN (VALUES {run_names}) AS run_names(filename, run_name)"
+                " USING (filename)"
+            )
+
+        keys = [f'"{k}"' for k in self.group_by]
+        aggregates = ['count(*) AS "count"'] + [
+            AGGREGATES[function].format(f'"{field}"') + f' AS "{function}({field})"'
+            for function, field in self.aggregates
+        ]
+        columns = (
+            self.group_by
+            + ["count"]
+            + [f"{function}({field})" for function, field in self.aggregates]
+        )
+
+        filters = " AND ".join(self.get_conditions())
+        order_by = ", ".join(
+            [
+                f"{field} {direction}"
+                for field, direction in self.order_by
+                if field.strip('"') in columns
+            ]
+        )
+
+        if filters:
+            filters = f"WHERE {filters}"
+        order_by = f"ORDER BY {order_by}" if order_by else "ORDER BY ALL"
+        return f"""SELECT {", ".join(keys + aggregates)} FROM {source} {filters} GROUP BY ALL {order_by}"""
+
+    def count_query(self, files: List[Path] = None):
+        files = files if files is not None else self.scanned_files
+        if not files:
             return ""
 
-        filters = " AND ".join(self.filters)
-        files = "[" + ",".join(f"'{f}'" for f in self.files) + "]"
+        filters = " AND ".join(self.get_conditions())
 
         if filters:
             filters = f" WHERE {filters} "
-        return f"""SELECT COUNT(*) AS count_star FROM read_parquet({files},union_by_name=True,filename=True) {filters}"""
+        return f"""SELECT COUNT(*) AS count_star FROM {self.source_expression(files)} {filters}"""
 
     def update(self):
         self.blockSignals(True)
-        if not self.files or all([not f.exists() for f in self.files]):
+        self.page_error = None
+        try:
+            self.load_page()
+        except db.Error as e:
+            # The query can still be changed to one that works, the error is shown meanwhile (see get_errors)
+            self.page_error = str(e)
             self.header = []
-            self.data = []
+            self.frame = pl.DataFrame()
+        finally:
             self.blockSignals(False)
-            self.query_changed.emit()
+        # The page is shown right away, the total count follows in the background
+        self.update_count()
+        self.update_page_count()
+        self.query_changed.emit()
+
+    def load_page(self):
+        """Fetch the current page, and set the header that goes with it"""
+        if not self.files or all([not dataset.exists(f) for f in self.files]):
+            self.header = []
+            self.frame = pl.DataFrame()
+            self.scanned_files = []
             return
-        dict_data = run_sql(self.select_query())
-        if dict_data:
-            self.header = list(dict_data[0].keys())
-            self.data = [list(row.values()) for row in dict_data]
+        # Filters on partition columns prune whole directories before any file is opened
+        self.scanned_files = dataset.prune_files(
+            self.files, self.partitions, self.filters
+        )
+        # The search index narrows the scan down to the files (and rows) containing every n-gram of the text
+        self.search_candidates = None
+        if self.search_text and self.search_columns and self.search_index:
+            self.search_candidates = search_index.lookup(
+                self.search_index, self.search_text
+            )
+            if self.search_candidates is not None:
+                self.scanned_files = [
+                    f for f in self.scanned_files if str(f) in self.search_candidates
+                ]
+        if not self.scanned_files:
+            frame = pl.DataFrame()
+        elif self.is_grouped():
+            # All the groups are computed (and cached) once, pages are slices of them
+            frame = run_sql(self.group_query()).slice(self.offset, self.limit)
+        elif self.uses_shards():
+            frame = self.run_sharded_page()
+        else:
+            # Only the columns in view are fetched, the others when scrolled to
+            self.ensure_fields()
+            self.load_columns(
+                self.visible_columns
+                if self.visible_columns is not None
+                else self.fields[:INITIAL_COLUMNS]
+            )
+            frame = self.frame
+        if not frame.is_empty() and (self.is_grouped() or self.uses_shards()):
+            self.header = frame.columns
+            self.frame = frame
+        elif not frame.is_empty():
+            self.header = ["run_name"] + self.fields
         else:
             self.header = []
-            self.data = []
-            self.row_count = 0
-            self.page_count = 1
-            self.set_page(1)
-            self.blockSignals(False)
-            self.query_changed.emit()
+            self.frame = pl.DataFrame()
+
+    def update_count(self):
+        query = self.group_query() if self.is_grouped() else self.count_query()
+        if query == self.count_key:
+            # Already counted, or being counted
+            return
+        self.count_key = query
+        # The same query text may be counted again (files rewritten, shards toggled), so results are matched to
+        # their count by this token rather than by the query
+        token = self.count_token = object()
+        self.count_workers = []
+        self.count_error = None
+        self.shard_count_errors = {}
+        if not query:
+            self.set_row_count(0, counting=False)
+            return
+        if self.is_grouped():
+            try:
+                rows = run_sql(query).height
+            except db.Error:
+                # Same query as the page, its error is reported already
+                rows = 0
+            self.set_row_count(rows, counting=False)
+            return
+        if query in _counts:
+            self.set_row_count(_counts[query], counting=False)
+            return
+        if self.uses_shards():
+            self.start_sharded_count(token, query)
             return
-        self.row_count = run_sql(self.count_query())[0]["count_star"]
-        self.page_count = self.row_count // self.limit
-        if self.row_count % self.limit > 0:
-            self.page_count = self.page_count + 1
-        if self.current_page > self.page_count:
+
+        if self.get_conditions():
+            batches = [
+                self.scanned_files[i : i + COUNT_BATCH_SIZE]
+                for i in range(0, len(self.scanned_files), COUNT_BATCH_SIZE)
+            ]
+            worker = engine.Worker(
+                count_rows_from_queries,
+                [self.count_query(batch) for batch in batches],
+                query,
+            )
+            self.count_progress = (0, len(batches))
+        else:
+            worker = engine.Worker(count_rows_from_footers, list(self.scanned_files))
+            self.count_progress = (0, len(self.scanned_files))
+        worker.signals.progress.connect(partial(self.on_count_progress, token))
+        worker.signals.finished.connect(partial(self.on_count_finished, token, query))
+        worker.signals.error.connect(partial(self.on_count_error, token))
+        self.count_workers = [worker]
+        self.set_row_count(0, counting=True)
+        engine.start(worker, self.priority)
+
+    def start_sharded_count(self, token: object, query: str):
+        """Count every shard in its own worker, see on_shard_counted"""
+        shards = self.get_shards()
+        for i, shard in enumerate(shards):
+            shard_query = self.count_query(shard)
+            if self.get_conditions():
+                worker = engine.Worker(
+                    count_rows_from_queries, [shard_query], shard_query
+                )
+            else:
+                worker = engine.Worker(count_rows_from_footers, shard)
+            worker.signals.finished.connect(
+                partial(self.on_shard_counted, token, query, i, shard_query)
+            )
+            worker.signals.error.connect(
+                partial(self.on_shard_count_error, token, query, i)
+            )
+            self.count_workers.append(worker)
+        self.shards_pending = len(shards)
+        self.count_progress = (0, len(shards))
+        self.set_row_count(0, counting=True)
+        for worker in self.count_workers:
+            engine.start(worker, self.priority)
+
+    def on_shard_counted(
+        self, token: object, query: str, shard: int, shard_query: str, rows: int
+    ):
+        if token is not self.count_token:
+            return
+        _counts[shard_query] = rows
+        self.on_shard_done(query, self.row_count + rows)
+
+    def on_shard_count_error(self, token: object, query: str, shard: int, message: str):
+        if token is not self.count_token:
+            return
+        self.shard_count_errors[shard] = message
+        self.on_shard_done(query, self.row_count)
+
+    def on_shard_done(self, query: str, rows: int):
+        self.shards_pending -= 1
+        done, total = self.count_progress
+        self.count_progress = (done + 1, total)
+        if not self.shards_pending and not self.shard_count_errors:
+            # Failed shards make the total a lower bound, it is not cached then
+            _counts[query] = rows
+        self.set_row_count(rows, counting=self.shards_pending > 0)
+
+    def on_count_progress(self, token: object, progress: Tuple[int, int, int]):
+        if token is not self.count_token:
+            return
+        rows, done, total = progress
+        self.count_progress = (done, total)
+        self.set_row_count(rows, counting=True)
+
+    def on_count_finished(self, token: object, query: str, rows: int):
+        if token is not self.count_token:
+            return
+        _counts[query] = rows
+        self.count_progress = (self.count_progress[1], self.count_progress[1])
+        self.set_row_count(rows, counting=False)
+
+    def on_count_error(self, token: object, message: str):
+        if token is not self.count_token:
+            return
+        # Keep what was counted so far, as a lower bound (see is_count_exact)
+        self.count_error = message
+        self.set_row_count(self.row_count, counting=False)
+
+    def set_row_count(self, rows: int, counting: bool):
+        self.row_count = rows
+        self.counting = counting
+        self.update_page_count()
+        self.count_changed.emit()
+        if not counting and self.current_page > self.page_count:
             self.set_page(self.page_count)
-            self.update()  # TODO: Fix edge case
-        self.blockSignals(False)
-        self.query_changed.emit()
+
+    def update_page_count(self):
+        self.page_count = max(1, math.ceil(self.row_count / self.limit))
+        if self.counting:
+            self.page_count = max(self.page_count, self.current_page)
 
     def to_dict(self):
         return {
             "fields": self.fields,
             "filters": self.filters,
             "order_by": self.order_by,
+            "group_by": self.group_by,
+            "aggregates": self.aggregates,
+            "sharded": self.sharded,
             "limit": self.limit,
             "offset": self.offset,
-            "file": [str(f) for f in self.files] if self.files else [],
+            "file": self.sources,
+            "fingerprints": self.fingerprints,
+            "row_count": (
+                self.row_count
+                if self.count_key and not self.counting and not self.is_grouped()
+                else None
+            ),
         }
 
-    def from_dict(self, d: dict):
+    def from_dict(self, d: dict, lazy: bool = False):
+        """Restore a query saved by to_dict
+
+        Args:
+            d (dict): as returned by to_dict
+            lazy (bool, optional): look for the files in the background, and only then run the query.
+            If the files didn't change, the saved row count is reused.
+        """
         self.fields = d.get("fields", [])
         self.filters = d.get("filters", [])
         self.order_by = d.get("order_by", [])
+        self.group_by = d.get("group_by", [])
+        self.aggregates = [tuple(a) for a in d.get("aggregates", [])]
+        self.sharded = d.get("sharded", False)
         self.limit = d.get("limit", 10)
         self.offset = d.get("offset", 0)
-        self.files = [Path(f) for f in d.get("file", [])]
-        self.update()
+        self.current_page = self.offset // self.limit + 1
+        if not lazy:
+            self.load_sources(d.get("file", []))
+            self.update()
+            return self
+
+        self.sources = [str(s) for s in d.get("file", [])]
+        worker = engine.Worker(
+            dataset.revalidate, self.sources, d.get("fingerprints", {})
+        )
+        worker.signals.finished.connect(
+            partial(self.on_revalidated, worker, d.get("row_count"))
+        )
+        worker.signals.error.connect(partial(self.on_revalidated, worker, None))
+        self.revalidate_worker = worker
+        engine.start(worker, self.priority)
         return self
+
+    def on_revalidated(self, worker: engine.Worker, row_count: int, result):
+        if worker is not self.revalidate_worker:
+            # Another dataset was opened in the meantime
+            return
+        self.revalidate_worker = None
+        if not isinstance(result, tuple):
+            # Revalidation failed, look for the files the usual way
+            self.load_sources(self.sources)
+            self.update()
+            return
+        files, fingerprints, unchanged = result
+        self.load_files(files, fingerprints)
+        if unchanged and row_count is not None and not self.is_grouped():
+            scanned = dataset.prune_files(self.files, self.partitions, self.filters)
+            _counts.setdefault(self.count_query(scanned), row_count)
+        self.update()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+# Stand-in for an HTTP/S3 endpoint when trying remote datasets locally: serves a directory with HEAD and
+# byte range (Range: bytes=a-b) support, which python -m http.server lacks.
+#
+#   python range_http_server.py /path/to/parquet/dir 8000
+#
+# then open http://localhost:8000/some/file.parquet with "Open URL". For s3:// URLs, set
+# AWS_ENDPOINT_URL=http://localhost:8000 and put the files under <dir>/<bucket>/.
+
+import os
+import re
+import sys
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+
+    def send_head(self):
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start, end = match.groups()
+        if start:
+            start, end = int(start), min(int(end) if end else size - 1, size - 1)
+        else:
+            start, end = max(0, size - int(end)), size - 1
+        if start > end:
+            self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header(
+            "Last-Modified", self.date_time_string(int(os.path.getmtime(path)))
+        )
+        self.end_headers()
+        self.range_length = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        length = getattr(self, "range_length", None)
+        if length is None:
+            return super().copyfile(source, outputfile)
+        outputfile.write(source.read(length))
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "."
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    handler = partial(RangeRequestHandler, directory=directory)
+    ThreadingHTTPServer(("", port), handler).serve_forever()
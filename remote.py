@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+import hashlib
+import os
+import threading
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow.parquet as pq
+
+from commons import cache_dir
+
+REMOTE_PREFIXES = ("http://", "https://", "s3://")
+
+BLOCK_SIZE = 1 << 20
+
+# Disk space used by cached blocks, least recently used blocks are evicted beyond it
+CACHE_BUDGET = 512 << 20
+
+# Missing blocks closer than this are fetched in the same request, along with the gap between them
+COALESCE_GAP = 2
+
+
+def is_remote(source: str) -> bool:
+    return str(source).startswith(REMOTE_PREFIXES)
+
+
+def http_url(url: str) -> str:
+    """URL to actually request: s3:// URLs go through AWS_ENDPOINT_URL if set (e.g. a local MinIO), path style"""
+    if not url.startswith("s3://"):
+        return url
+    bucket, _, key = url[len("s3://") :].partition("/")
+    endpoint = os.environ.get("AWS_ENDPOINT_URL")
+    if endpoint:
+        return f"{endpoint.rstrip('/')}/{bucket}/{urllib.parse.quote(key)}"
+    return f"https://{bucket}.s3.amazonaws.com/{urllib.parse.quote(key)}"
+
+
+class RemoteObject:
+    """Size and version of a remote file, from a HEAD request"""
+
+    def __init__(self, url: str):
+        request = urllib.request.Request(http_url(url), method="HEAD")
+        with urllib.request.urlopen(request) as response:
+            self.size = int(response.headers["Content-Length"])
+            self.etag = response.headers.get("ETag", "")
+            modified = response.headers.get("Last-Modified")
+        self.modified_ns = (
+            int(parsedate_to_datetime(modified).timestamp() * 1e9) if modified else 0
+        )
+        self.version = hashlib.sha1(
+            f"{url}:{self.etag}:{modified}".encode()
+        ).hexdigest()
+
+
+_objects: Dict[str, RemoteObject] = {}
+
+
+def stat(url: str, refresh: bool = False) -> RemoteObject:
+    if refresh or url not in _objects:
+        _objects[url] = RemoteObject(url)
+    return _objects[url]
+
+
+def fingerprint(url: str, refresh: bool = True) -> Tuple[int, int]:
+    """Same as dataset.fingerprint, for remote files
+
+    Args:
+        url (str): the remote file
+        refresh (bool, optional): ask the server again, rather than reusing the last answer
+    """
+    obj = stat(url, refresh=refresh)
+    return obj.modified_ns, obj.size
+
+
+class BlockCache:
+    """Fixed size blocks of remote files, stored on disk within a size budget"""
+
+    def __init__(self, budget: int = CACHE_BUDGET):
+        self.budget = budget
+        self.directory = cache_dir("remote")
+        self.lock = threading.Lock()
+        # Block files from the least to the most recently used, with their sizes
+        self.blocks = OrderedDict()
+        files = sorted(self.directory.iterdir(), key=lambda p: p.stat().st_mtime)
+        for p in files:
+            self.blocks[p.name] = p.stat().st_size
+        self.size = sum(self.blocks.values())
+
+    def get(self, key: str):
+        with self.lock:
+            if key not in self.blocks:
+                return None
+            self.blocks.move_to_end(key)
+        try:
+            return (self.directory / key).read_bytes()
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        (self.directory / key).write_bytes(data)
+        with self.lock:
+            self.size += len(data) - self.blocks.pop(key, 0)
+            self.blocks[key] = len(data)
+            while self.size > self.budget and len(self.blocks) > 1:
+                old, size = self.blocks.popitem(last=False)
+                self.size -= size
+                (self.directory / old).unlink(missing_ok=True)
+
+
+_cache = None
+
+
+def block_cache() -> BlockCache:
+    global _cache
+    if _cache is None:
+        _cache = BlockCache()
+    return _cache
+
+
+def block_range(start: int, end: int) -> range:
+    """Indexes of the blocks holding bytes [start, end)"""
+    if end <= start:
+        return range(0)
+    return range(start // BLOCK_SIZE, (end - 1) // BLOCK_SIZE + 1)
+
+
+def fetch(url: str, start: int, end: int) -> bytes:
+    """Bytes [start, end) of a remote file, in a single range request"""
+    request = urllib.request.Request(
+        http_url(url), headers={"Range": f"bytes={start}-{end - 1}"}
+    )
+    with urllib.request.urlopen(request) as response:
+        data = response.read()
+    if response.status != 206:
+        # The server ignored the range and sent the whole file
+        data = data[start:end]
+    return data
+
+
+def coalesce(blocks: List[int], gap: int = COALESCE_GAP) -> List[Tuple[int, int]]:
+    """Group sorted block indexes into (first, last) runs, merging runs separated by less than gap blocks"""
+    runs = []
+    for b in blocks:
+        if runs and b - runs[-1][1] <= gap:
+            runs[-1] = (runs[-1][0], b)
+        else:
+            runs.append((b, b))
+    return runs
+
+
+def read_ranges(url: str, ranges: List[Tuple[int, int]]) -> List[bytes]:
+    """Read several byte ranges [start, end) of a remote file through the block cache
+
+    The blocks missing from the cache for all the ranges are fetched together, with nearby ones coalesced into a
+    single request.
+    """
+    obj = stat(url)
+    cache = block_cache()
+    ranges = [(start, min(end, obj.size)) for start, end in ranges]
+    wanted = sorted(set(b for start, end in ranges for b in block_range(start, end)))
+    blocks = {}
+    missing = []
+    for b in wanted:
+        data = cache.get(f"{obj.version}_{b}")
+        if data is None:
+            missing.append(b)
+        else:
+            blocks[b] = data
+    for first, last in coalesce(missing):
+        start = first * BLOCK_SIZE
+        data = fetch(url, start, min((last + 1) * BLOCK_SIZE, obj.size))
+        for b in range(first, last + 1):
+            block = data[(b - first) * BLOCK_SIZE : (b - first + 1) * BLOCK_SIZE]
+            blocks[b] = block
+            cache.put(f"{obj.version}_{b}", block)
+
+    results = []
+    for start, end in ranges:
+        chunks = []
+        for b in block_range(start, end):
+            block_start = b * BLOCK_SIZE
+            chunks.append(blocks[b][max(0, start - block_start) : end - block_start])
+        results.append(b"".join(chunks))
+    return results
+
+
+_layouts: Dict[str, List[List[Tuple[int, int]]]] = {}
+
+
+def column_chunks(url: str) -> List[List[Tuple[int, int]]]:
+    """Byte range [start, end) of every column chunk of a remote parquet file, by row group then column
+
+    Read from the footer (through the block cache), once per version of the file.
+    """
+    obj = stat(url)
+    if obj.version not in _layouts:
+        with RangeReader(url) as f:
+            meta = pq.read_metadata(f)
+        layout = []
+        for i in range(meta.num_row_groups):
+            row_group = meta.row_group(i)
+            chunks = []
+            for j in range(row_group.num_columns):
+                column = row_group.column(j)
+                start = column.data_page_offset
+                if column.has_dictionary_page and column.dictionary_page_offset:
+                    start = min(start, column.dictionary_page_offset)
+                chunks.append((start, start + column.total_compressed_size))
+            layout.append(chunks)
+        _layouts[obj.version] = layout
+    return _layouts[obj.version]
+
+
+def find_chunk(
+    layout: List[List[Tuple[int, int]]], offset: int
+) -> Optional[Tuple[int, int]]:
+    """(row group, column) of the column chunk holding this offset, None for the footer and headers"""
+    for i, chunks in enumerate(layout):
+        for j, (start, end) in enumerate(chunks):
+            if start <= offset < end:
+                return i, j
+    return None
+
+
+class RangeReader:
+    """Read-only file object over a remote file, reading through the block cache"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.size = stat(url).size
+        self.position = 0
+        self.closed = False
+
+    def read(self, n: int = -1) -> bytes:
+        end = self.size if n is None or n < 0 else min(self.size, self.position + n)
+        if end <= self.position:
+            return b""
+        data = read_ranges(self.url, [(self.position, end)])[0]
+        self.position = end
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def seekable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def configure(con):
+    """Make remote files readable by a DuckDB database
+
+    DuckDB reads them through the block cache, see remote_filesystem. Should fsspec be missing, the httpfs
+    extension is used instead (downloaded by DuckDB on first use), with DuckDB's own metadata caches.
+    """
+    try:
+        from remote_filesystem import CachedRangeFileSystem
+    except ImportError:
+        con.sql("INSTALL httpfs")
+        con.sql("LOAD httpfs")
+        con.sql("SET enable_http_metadata_cache=true")
+        con.sql("SET enable_object_cache=true")
+        endpoint = os.environ.get("AWS_ENDPOINT_URL")
+        if endpoint:
+            parsed = urllib.parse.urlparse(endpoint)
+            con.sql(f"SET s3_endpoint='{parsed.netloc}'")
+            con.sql("SET s3_url_style='path'")
+            con.sql(f"SET s3_use_ssl={parsed.scheme == 'https'}")
+    else:
+        con.register_filesystem(CachedRangeFileSystem())
+
+
+_setup_lock = threading.Lock()
+_set_up = False
+
+
+def setup(con):
+    """configure the shared database, once"""
+    global _set_up
+    with _setup_lock:
+        if not _set_up:
+            configure(con)
+            _set_up = True
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb as db
+from cachetools import LRUCache, cached
+
+import dataset
+import engine
+import metadata
+import remote
+from commons import cache_dir, sql_string
+
+NGRAM = 3
+
+# Above this many candidate rows, the index is only used to prune files
+MAX_CANDIDATE_ROWS = 10000
+
+# Searches whose candidates are kept around
+LOOKUP_CACHE_SIZE = 64
+
+_attached = {}
+
+
+def index_path(files: List[Path], columns: List[str]) -> Path:
+    """Where the index of these columns for these files is stored
+
+    The name depends on the content of the files (see dataset.fingerprint), so a stale index is never reused.
+    """
+    h = hashlib.sha1()
+    for f in sorted(str(f) for f in files):
+        # Remote files were checked when the dataset was (re)loaded, no need to ask the server on every search
+        fp = (
+            remote.fingerprint(f, refresh=False)
+            if remote.is_remote(f)
+            else dataset.fingerprint(f)
+        )
+        h.update(f"{f}:{fp}\n".encode())
+    for c in sorted(columns):
+        h.update(f"{c}\n".encode())
+    return cache_dir("search") / f"{h.hexdigest()}.duckdb"
+
+
+def grams(text: str) -> List[str]:
+    text = text.lower()
+    return sorted(set(text[i : i + NGRAM] for i in range(len(text) - NGRAM + 1)))
+
+
+def build_index(files: List[Path], columns: List[str], progress=None) -> Path:
+    """Build the n-gram index of the given columns, one file at a time
+
+    The index is written to a temporary file first, so an interrupted build never leaves a broken index behind.
+
+    Args:
+        files (List[Path]): the parquet files to index
+        columns (List[str]): the columns to index, cast to text
+        progress (Callable, optional): called with (indexed files, total files) after each file
+
+    Returns:
+        Path: the path of the index, see index_path
+    """
+    path = index_path(files, columns)
+    tmp = path.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    con = db.connect(str(tmp))
+    if any(remote.is_remote(f) for f in files):
+        remote.configure(con)
+    try:
+        con.execute("CREATE TABLE files (file_id INTEGER, file VARCHAR)")
+        con.execute(
+            "CREATE TEMP TABLE raw_grams (gram VARCHAR, file_id INTEGER, row BIGINT)"
+        )
+        for file_id, f in enumerate(files):
+            con.execute("INSERT INTO files VALUES (?, ?)", [file_id, str(f)])
+            file_columns = metadata.schema(f)
+            present = [c for c in columns if c in file_columns]
+            if present:
+                text = ", ".join(f'CAST("{c}" AS VARCHAR)' for c in present)
+                con.execute(
+                    f"""INSERT INTO raw_grams SELECT DISTINCT substr(text, i, {NGRAM}) AS gram, {file_id} AS file_id, row FROM (SELECT row, text, unnest(range(1, length(text) - {NGRAM - 2})) AS i FROM (SELECT file_row_number AS row, lower(concat_ws(chr(31), {text})) AS text FROM read_parquet({sql_string(str(f))}, file_row_number=True)))"""
+                )
+            if progress:
+                progress((file_id + 1, len(files)))
+        # Sorting by gram lets lookups skip most of the table
+        con.execute("CREATE TABLE grams AS SELECT * FROM raw_grams ORDER BY gram")
+    finally:
+        con.close()
+    os.replace(tmp, path)
+    return path
+
+
+def attach(path: Path) -> str:
+    """Attach an index to the shared database (once) and return its alias"""
+    if path not in _attached:
+        alias = f"search_{path.stem[:16]}"
+        engine.cursor().sql(f"ATTACH {sql_string(str(path))} AS {alias} (READ_ONLY)")
+        _attached[path] = alias
+    return _attached[path]
+
+
+def find_index(files: List[Path], columns: List[str]) -> Optional[str]:
+    """Alias of an already built index for these files and columns, or None"""
+    if not files or not columns:
+        return None
+    path = index_path(files, columns)
+    if not path.exists():
+        return None
+    return attach(path)
+
+
+@cached(cache=LRUCache(maxsize=LOOKUP_CACHE_SIZE))
+def lookup(alias: str, text: str) -> Optional[Dict[str, Optional[List[int]]]]:
+    """Files, and rows when there are few enough of them, that contain every n-gram of text
+
+    Returns None when text is too short for the index to help. Above MAX_CANDIDATE_ROWS candidate rows, only the
+    files are returned, with None as their rows.
+    """
+    needles = grams(text)
+    if not needles:
+        return None
+    in_list = ", ".join(sql_string(g) for g in needles)
+    matches = f"""SELECT file_id, row FROM {alias}.grams WHERE gram IN ({in_list}) GROUP BY file_id, row HAVING count(DISTINCT gram) = {len(needles)}"""
+    counts = (
+        engine.cursor()
+        .sql(
+            f"""SELECT f.file, count(*) FROM ({matches}) m JOIN {alias}.files f USING (file_id) GROUP BY f.file"""
+        )
+        .fetchall()
+    )
+    if sum(count for _, count in counts) > MAX_CANDIDATE_ROWS:
+        return {file: None for file, _ in counts}
+    rows = (
+        engine.cursor()
+        .sql(
+            f"""SELECT f.file, m.row FROM ({matches}) m JOIN {alias}.files f USING (file_id)"""
+        )
+        .fetchall()
+    )
+    candidates = {}
+    for file, row in rows:
+        candidates.setdefault(file, []).append(row)
+    return candidates
+
+
+def search_condition(
+    text: str, columns: List[str], candidates: Optional[Dict[str, List[int]]] = None
+) -> str:
+    """SQL condition matching the rows where any of the columns contains text (case insensitive)
+
+    Args:
+        text (str): the text to search for
+        columns (List[str]): the columns to search in
+        candidates (Optional[Dict[str, Optional[List[int]]]], optional): as returned by lookup. When it holds
+        rows, only these rows are checked. The scan must then be made with file_row_number=True.
+
+    Returns:
+        str: the condition, to be added to the WHERE clause
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = sql_string(f"%{escaped}%")
+    condition = (
+        "("
+        + " OR ".join(
+            f"CAST(\"{c}\" AS VARCHAR) ILIKE {pattern} ESCAPE '\\'" for c in columns
+        )
+        + ")"
+    )
+    if candidates is not None and all(rows is not None for rows in candidates.values()):
+        rows = " OR ".join(
+            f"(filename = {sql_string(file)} AND file_row_number IN ({', '.join(map(str, file_rows))}))"
+            for file, file_rows in candidates.items()
+        )
+        condition = f"({rows or 'FALSE'}) AND {condition}"
+    return condition
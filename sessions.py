@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import List
+
+MAGIC = b"PQVS"
+VERSION = 1
+
+DEFAULT_SESSION = "default"
+MAX_RECENT = 20
+
+
+def encode(data: dict) -> bytes:
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    return MAGIC + bytes([VERSION]) + zlib.compress(payload)
+
+
+def decode(raw: bytes) -> dict:
+    if raw[: len(MAGIC)] != MAGIC or raw[len(MAGIC)] != VERSION:
+        raise ValueError("Not a session file")
+    return json.loads(zlib.decompress(raw[len(MAGIC) + 1 :]))
+
+
+def atomic_write(path: Path, raw: bytes):
+    """Write to a temporary file next to path, then rename it, so path is never left half written"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class SessionStore:
+    """Named sessions (the tabs and their queries), recent datasets and user preferences
+
+    Everything is kept in memory and written at once, compressed, by save.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.path = directory / "sessions.bin"
+
+        self.sessions = {}
+        self.current = DEFAULT_SESSION
+        self.recent = []
+        self.prefs = {}
+
+        self.load()
+
+    def load(self):
+        if self.path.exists():
+            try:
+                data = decode(self.path.read_bytes())
+            except (ValueError, IndexError, zlib.error, json.JSONDecodeError):
+                return
+            self.sessions = data.get("sessions", {})
+            self.current = data.get("current", DEFAULT_SESSION)
+            self.recent = data.get("recent", [])
+            self.prefs = data.get("prefs", {})
+        elif (self.directory / "config.json").exists():
+            self.load_legacy_config()
+
+    def load_legacy_config(self):
+        """Import the config.json written by previous versions"""
+        with open(self.directory / "config.json", "r") as f:
+            prefs = json.load(f)
+        queries = prefs.pop("queries", [prefs["query"]] if "query" in prefs else [])
+        prefs.pop("query", None)
+        self.sessions = {DEFAULT_SESSION: {"tabs": queries, "current_tab": 0}}
+        self.prefs = prefs
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        atomic_write(
+            self.path,
+            encode(
+                {
+                    "sessions": self.sessions,
+                    "current": self.current,
+                    "recent": self.recent,
+                    "prefs": self.prefs,
+                }
+            ),
+        )
+
+    def session_names(self) -> List[str]:
+        return sorted(self.sessions)
+
+    def get_session(self, name: str) -> dict:
+        return self.sessions.get(name, {"tabs": [], "current_tab": 0})
+
+    def set_session(self, name: str, tabs: List[dict], current_tab: int):
+        self.sessions[name] = {"tabs": tabs, "current_tab": current_tab}
+        self.current = name
+
+    def remove_session(self, name: str):
+        self.sessions.pop(name, None)
+
+    def add_recent(self, sources: List[str]):
+        sources = [str(s) for s in sources]
+        if sources in self.recent:
+            self.recent.remove(sources)
+        self.recent.insert(0, sources)
+        del self.recent[MAX_RECENT:]
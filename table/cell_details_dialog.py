@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+from typing import Any
+
+import PySide6.QtCore as qc
+import PySide6.QtWidgets as qw
+
+from commons import dict_flatten
+from table.cell_formatter import CellFormatter
+
+# Children shown under a single node, the rest is summarized
+MAX_CHILDREN = 1000
+
+
+class CellDetailsDialog(qw.QDialog):
+    """Show a (possibly nested) cell value as a tree, expanding nodes only when the user opens them"""
+
+    def __init__(self, name: str, value: Any, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(name)
+
+        self.formatter = CellFormatter()
+
+        self.tree = qw.QTreeWidget()
+        self.tree.setHeaderLabels(["Key", "Value"])
+        self.tree.itemExpanded.connect(self.populate)
+        self.tree.addTopLevelItem(self.make_item(name, value))
+
+        self.ok = qw.QDialogButtonBox(qw.QDialogButtonBox.StandardButton.Ok)
+        self.ok.accepted.connect(self.accept)
+
+        layout = qw.QVBoxLayout()
+        layout.addWidget(self.tree)
+        layout.addWidget(self.ok)
+        self.setLayout(layout)
+        self.resize(600, 400)
+
+    def make_item(self, key: str, value: Any) -> qw.QTreeWidgetItem:
+        item = qw.QTreeWidgetItem([key, self.formatter.format(value)])
+        item.setData(1, qc.Qt.ItemDataRole.UserRole, value)
+        if isinstance(value, (dict, list, tuple)) and value:
+            item.setChildIndicatorPolicy(
+                qw.QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator
+            )
+        return item
+
+    def populate(self, item: qw.QTreeWidgetItem):
+        value = item.data(1, qc.Qt.ItemDataRole.UserRole)
+        if item.childCount() or not isinstance(value, (dict, list, tuple)):
+            return
+        if isinstance(value, dict):
+            children = dict_flatten(value)
+        else:
+            children = ((f"[{i}]", v) for i, v in enumerate(value))
+        for i, (key, child) in enumerate(children):
+            if i >= MAX_CHILDREN:
+                item.addChild(qw.QTreeWidgetItem(["…", "not shown"]))
+                break
+            item.addChild(self.make_item(key, child))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+from typing import Any, Callable, Dict, Iterator
+
+from commons import dict_flatten
+
+ELLIPSIS = "…"
+
+
+class CellFormatter:
+    """Turn cell values into short display strings
+
+    Formatters are looked up by the type of the value (following its MRO), and never build more than max_chars
+    characters, so that a huge list or struct costs no more than a small one.
+    """
+
+    def __init__(self, max_chars: int = 200, max_items: int = 20):
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.formatters: Dict[type, Callable[[Any, int], str]] = {
+            type(None): lambda value, max_chars: "",
+            str: self.format_str,
+            bytes: self.format_bytes,
+            list: self.format_list,
+            tuple: self.format_list,
+            dict: self.format_dict,
+        }
+
+    def register(self, value_type: type, formatter: Callable[[Any, int], str]):
+        self.formatters[value_type] = formatter
+
+    def format(self, value: Any, max_chars: int = None) -> str:
+        max_chars = max_chars or self.max_chars
+        for value_type in type(value).__mro__:
+            if value_type in self.formatters:
+                return self.formatters[value_type](value, max_chars)
+        return self.truncate(str(value), max_chars)
+
+    def truncate(self, text: str, max_chars: int) -> str:
+        if len(text) > max_chars:
+            return text[: max_chars - 1] + ELLIPSIS
+        return text
+
+    def join(self, parts: Iterator[str], max_chars: int, sep: str = ", ") -> str:
+        """Join parts, stopping as soon as max_chars is reached"""
+        text = ""
+        for i, part in enumerate(parts):
+            if i >= self.max_items:
+                return self.truncate(text + sep + ELLIPSIS, max_chars)
+            text += (sep if i else "") + part
+            if len(text) > max_chars:
+                return self.truncate(text, max_chars)
+        return text
+
+    def format_str(self, value: str, max_chars: int) -> str:
+        # Only the first line is shown, newlines would make rows grow
+        first_line, _, rest = value[: max_chars + 1].partition("\n")
+        if rest:
+            return self.truncate(first_line, max_chars - 1) + ELLIPSIS
+        return self.truncate(first_line, max_chars)
+
+    def format_bytes(self, value: bytes, max_chars: int) -> str:
+        preview = value[: max_chars // 2].hex()
+        return self.truncate(f"<{len(value)} bytes> {preview}", max_chars)
+
+    def format_list(self, value: list, max_chars: int) -> str:
+        parts = (self.format(v, max_chars) for v in value)
+        return f"[{len(value)}] " + self.join(parts, max_chars)
+
+    def format_dict(self, value: dict, max_chars: int) -> str:
+        # Structs are shown flattened, with dotted keys
+        parts = (f"{key}={self.format(v, max_chars)}" for key, v in dict_flatten(value))
+        return "{" + self.join(parts, max_chars) + "}"
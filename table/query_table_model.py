@@ -2,8 +2,13 @@
 
 
 import PySide6.QtCore as qc
+from cachetools import LRUCache
 
 from query import Query
+from table.cell_formatter import CellFormatter
+
+# Formatted cells kept around, a few screens worth
+CACHE_SIZE = 8192
 
 
 class QueryTableModel(qc.QAbstractTableModel):
@@ -11,28 +16,46 @@ class QueryTableModel(qc.QAbstractTableModel):
     def __init__(self, query: Query, parent=None):
         super().__init__(parent)
         self.query = query
+        self.formatter = CellFormatter()
+        self.tooltip_chars = 2000
+
+        # Qt only asks for visible cells, so only those get converted and formatted
+        self.cache = LRUCache(maxsize=CACHE_SIZE)
 
         self.query.query_changed.connect(self.update)
+        self.query.columns_loaded.connect(self.on_columns_loaded)
 
     def rowCount(self, parent):
         if parent.isValid():
             return 0
-        return len(self.query.get_data())
+        return self.query.get_row_count()
 
     def columnCount(self, parent):
         if parent.isValid():
             return 0
-        if self.query.get_data():
-            return len(self.query.get_data()[0])
-        return 0
+        return self.query.get_column_count()
 
     def data(self, index, role):
-        if role == qc.Qt.ItemDataRole.DisplayRole:
-            if index.row() < 0 or index.row() >= len(self.query.get_data()):
-                return None
-            if index.column() < 0 or index.column() >= len(self.query.get_data()[0]):
-                return None
-            return self.query.get_data()[index.row()][index.column()]
+        if role not in (
+            qc.Qt.ItemDataRole.DisplayRole,
+            qc.Qt.ItemDataRole.ToolTipRole,
+        ):
+            return None
+        if index.row() < 0 or index.row() >= self.query.get_row_count():
+            return None
+        if index.column() < 0 or index.column() >= self.query.get_column_count():
+            return None
+        key = (index.row(), index.column(), role)
+        if key not in self.cache:
+            value = self.query.get_value(index.row(), index.column())
+            if role == qc.Qt.ItemDataRole.DisplayRole:
+                self.cache[key] = self.formatter.format(value)
+            else:
+                self.cache[key] = self.formatter.format(value, self.tooltip_chars)
+        return self.cache[key]
+
+    def raw_data(self, index):
+        return self.query.get_value(index.row(), index.column())
 
     def headerData(self, section, orientation, role):
         if section >= len(self.query.get_header()):
@@ -43,4 +66,16 @@ class QueryTableModel(qc.QAbstractTableModel):
 
     def update(self):
         self.beginResetModel()
+        self.cache.clear()
         self.endResetModel()
+
+    def on_columns_loaded(self):
+        # Same rows and columns, only the values of the columns just loaded changed
+        self.cache.clear()
+        self.dataChanged.emit(
+            self.index(0, 0),
+            self.index(
+                self.rowCount(qc.QModelIndex()) - 1,
+                self.columnCount(qc.QModelIndex()) - 1,
+            ),
+        )
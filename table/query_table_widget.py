@@ -1,11 +1,17 @@
 #!/usr/bin/env python
 
 
+import PySide6.QtCore as qc
 import PySide6.QtWidgets as qw
 
 from common_widgets.page_selector import PageSelector
 from query import Query
+from table.cell_details_dialog import CellDetailsDialog
 from table.query_table_model import QueryTableModel
+from table.search_bar import SearchBar
+
+# Columns loaded on each side of the visible ones, so that scrolling a little doesn't wait
+COLUMN_MARGIN = 5
 
 
 class QueryTableWidget(qw.QWidget):
@@ -16,6 +22,8 @@ class QueryTableWidget(qw.QWidget):
         self.query = query
         self.model = QueryTableModel(query)
 
+        self.search_bar = SearchBar(query)
+
         self.table_view = qw.QTableView()
         self.table_view.setSelectionBehavior(
             qw.QAbstractItemView.SelectionBehavior.SelectRows
@@ -27,11 +35,70 @@ class QueryTableWidget(qw.QWidget):
             True
         )  # Set last column to expand
         self.table_view.setModel(self.model)
+        self.table_view.doubleClicked.connect(self.show_cell_details)
+
+        # Only the columns in view are fetched, see Query.set_visible_columns
+        self.visible_columns_timer = qc.QTimer(self)
+        self.visible_columns_timer.setSingleShot(True)
+        self.visible_columns_timer.setInterval(50)
+        self.visible_columns_timer.timeout.connect(self.update_visible_columns)
+        self.table_view.horizontalScrollBar().valueChanged.connect(
+            self.schedule_visible_columns
+        )
+        self.table_view.horizontalHeader().sectionResized.connect(
+            self.schedule_visible_columns
+        )
+        self.table_view.horizontalHeader().geometriesChanged.connect(
+            self.schedule_visible_columns
+        )
+        self.model.modelReset.connect(self.schedule_visible_columns)
 
         self.page_selector = PageSelector(query)
 
+        self.error_label = qw.QLabel()
+        self.error_label.setWordWrap(True)
+        self.error_label.setStyleSheet("color: red")
+        self.error_label.setVisible(False)
+        self.query.query_changed.connect(self.show_errors)
+        self.query.count_changed.connect(self.show_errors)
+        self.query.columns_loaded.connect(self.show_errors)
+
         layout = qw.QVBoxLayout()
+        layout.addWidget(self.search_bar)
         layout.addWidget(self.table_view)
+        layout.addWidget(self.error_label)
         layout.addWidget(self.page_selector)
 
         self.setLayout(layout)
+
+    def schedule_visible_columns(self, *_):
+        self.visible_columns_timer.start()
+
+    def update_visible_columns(self):
+        header = self.table_view.horizontalHeader()
+        count = self.model.columnCount(qc.QModelIndex())
+        first = header.logicalIndexAt(0)
+        if first < 0 or not count:
+            return
+        last = header.logicalIndexAt(header.viewport().width() - 1)
+        if last < 0:
+            last = count - 1
+        first = max(0, first - COLUMN_MARGIN)
+        last = min(count - 1, last + COLUMN_MARGIN)
+        names = self.query.get_header()
+        self.query.set_visible_columns(names[first : last + 1])
+
+    def show_errors(self):
+        errors = self.query.get_errors()
+        self.error_label.setText("\n".join(errors))
+        self.error_label.setToolTip("\n".join(errors))
+        self.error_label.setVisible(bool(errors))
+
+    def show_cell_details(self, index):
+        name = self.model.headerData(
+            index.column(),
+            qc.Qt.Orientation.Horizontal,
+            qc.Qt.ItemDataRole.DisplayRole,
+        )
+        dialog = CellDetailsDialog(name, self.model.raw_data(index), self)
+        dialog.exec()
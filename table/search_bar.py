@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+
+import PySide6.QtWidgets as qw
+
+import engine
+import search_index
+from common_widgets.string_list_chooser import StringListChooser
+from query import Query
+
+
+class SearchBar(qw.QWidget):
+
+    def __init__(self, query: Query, parent=None):
+        super().__init__(parent)
+
+        self.query = query
+        self.columns = []
+        self.worker = None
+
+        self.search_lineedit = qw.QLineEdit()
+        self.search_lineedit.setPlaceholderText("Search in all rows...")
+        self.search_lineedit.returnPressed.connect(self.search)
+        self.columns_button = qw.QPushButton("Columns...")
+        self.columns_button.clicked.connect(self.choose_columns)
+        self.index_button = qw.QPushButton("Build index")
+        self.index_button.clicked.connect(self.build_index)
+        self.progress_bar = qw.QProgressBar()
+        self.progress_bar.setVisible(False)
+
+        layout = qw.QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.search_lineedit)
+        layout.addWidget(self.columns_button)
+        layout.addWidget(self.index_button)
+        layout.addWidget(self.progress_bar)
+        self.setLayout(layout)
+
+        self.query.file_changed.connect(self.reset)
+
+    def reset(self):
+        self.columns = []
+        self.search_lineedit.clear()
+
+    def get_columns(self):
+        if self.columns:
+            return self.columns
+        # Default to the string columns being displayed
+        string_fields = self.query.get_string_fields()
+        return [f for f in self.query.get_fields() if f in string_fields]
+
+    def choose_columns(self):
+        if not self.query.files:
+            qw.QMessageBox.warning(
+                self, "No file selected", "Please select a file first"
+            )
+            return
+        dialog = StringListChooser(self.query.get_string_fields(), self)
+        if dialog.exec() == qw.QDialog.DialogCode.Accepted:
+            self.columns = dialog.get_selected()
+            self.search()
+
+    def search(self):
+        columns = self.get_columns()
+        index = search_index.find_index(self.query.files, columns)
+        self.query.set_search(self.search_lineedit.text(), columns, index)
+
+    def build_index(self):
+        columns = self.get_columns()
+        if not self.query.files or not columns:
+            return
+        self.index_button.setEnabled(False)
+        self.progress_bar.setRange(0, len(self.query.files))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.worker = engine.Worker(
+            search_index.build_index, list(self.query.files), columns
+        )
+        self.worker.signals.progress.connect(self.on_index_progress)
+        self.worker.signals.finished.connect(self.on_index_built)
+        self.worker.signals.error.connect(self.on_index_error)
+        engine.start(self.worker, self.query.get_priority())
+
+    def on_index_progress(self, progress):
+        done, _ = progress
+        self.progress_bar.setValue(done)
+
+    def on_index_built(self, _):
+        self.index_button.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        if self.search_lineedit.text():
+            self.search()
+
+    def on_index_error(self, message):
+        self.index_button.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        qw.QMessageBox.warning(self, "Could not build the search index", message)
@@ -0,0 +1,84 @@
+import os
+import sys
+from pathlib import Path
+
+# Qt runs without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import polars as pl
+import pytest
+import PySide6.QtCore as qc
+import PySide6.QtWidgets as qw
+
+from common_widgets.page_selector import MAX_ROWS_PER_PAGE
+from query import Query
+
+# Caches and settings go to a throwaway location rather than the user's
+qc.QStandardPaths.setTestModeEnabled(True)
+
+FILE_COUNT = 4
+ROWS_PER_FILE = 30000
+
+
+@pytest.fixture(scope="session")
+def app():
+    return qw.QApplication.instance() or qw.QApplication([])
+
+
+@pytest.fixture(scope="session")
+def large_dataset(tmp_path_factory) -> Path:
+    """A directory of parquet files, with more rows than the largest page and a mix of column types"""
+    directory = tmp_path_factory.mktemp("large_dataset")
+    for i in range(FILE_COUNT):
+        ids = range(i * ROWS_PER_FILE, (i + 1) * ROWS_PER_FILE)
+        pl.DataFrame(
+            {
+                "id": list(ids),
+                "value": [n * 0.5 for n in ids],
+                "label": [f"label {n}" for n in ids],
+                "category": [f"category {n % 7}" for n in ids],
+                "tags": [[f"tag{n % 3}", f"tag{n % 5}"] for n in ids],
+                "point": [{"x": n, "y": -n} for n in ids],
+                "flag": [n % 2 == 0 for n in ids],
+                "score": [n % 1000 for n in ids],
+            }
+        ).write_parquet(directory / f"part_{i}.parquet")
+    return directory
+
+
+def wait_for_background_work(app):
+    qc.QThreadPool.globalInstance().waitForDone()
+    app.processEvents()
+
+
+@pytest.fixture
+def query(app, large_dataset) -> Query:
+    """A query on large_dataset showing every column, with pages as large as the page selector allows"""
+    query = Query()
+    query.set_sources([str(large_dataset)])
+    query.set_fields(query.get_available_fields())
+    query.set_limit(MAX_ROWS_PER_PAGE)
+    wait_for_background_work(app)
+    yield query
+    wait_for_background_work(app)
+
+
+@pytest.fixture
+def wait(app):
+    """Run the background work started so far, and deliver its results"""
+    yield lambda: wait_for_background_work(app)
+    wait_for_background_work(app)
+
+
+@pytest.fixture
+def write_files(tmp_path):
+    """Write parquet files (name -> columns) in a fresh directory, and return that directory"""
+
+    def write(files: dict) -> Path:
+        for name, columns in files.items():
+            pl.DataFrame(columns).write_parquet(tmp_path / name)
+        return tmp_path
+
+    return write
@@ -0,0 +1,31 @@
+import PySide6.QtGui as qg
+
+from common_widgets.page_selector import MAX_ROWS_PER_PAGE, PageSelector
+
+
+def test_rows_per_page_limits(query):
+    selector = PageSelector(query)
+    validator = selector.rows_lineedit.validator()
+
+    assert validator.validate(str(MAX_ROWS_PER_PAGE), 0)[0] == (
+        qg.QValidator.State.Acceptable
+    )
+    assert validator.validate(str(MAX_ROWS_PER_PAGE + 1), 0)[0] != (
+        qg.QValidator.State.Acceptable
+    )
+    assert validator.validate("0", 0)[0] != qg.QValidator.State.Acceptable
+
+
+def test_rows_per_page_applied_once_typed(query):
+    selector = PageSelector(query)
+    query.set_limit(10)
+    updates = []
+    query.query_changed.connect(lambda: updates.append(query.get_limit()))
+
+    selector.rows_lineedit.setText(str(MAX_ROWS_PER_PAGE))
+    assert not updates
+    selector.rows_lineedit.editingFinished.emit()
+
+    assert updates == [MAX_ROWS_PER_PAGE]
+    assert query.get_row_count() == MAX_ROWS_PER_PAGE
+    assert selector.page_lineedit.text() == "1"
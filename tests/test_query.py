@@ -0,0 +1,105 @@
+from common_widgets.page_selector import PageSelector
+from query import AGGREGATES, Query, _counts
+
+
+def test_count_error_is_reported(app, wait, write_files):
+    directory = write_files({f"{i}.parquet": {"a": list(range(5))} for i in range(3)})
+    query = Query()
+    selector = PageSelector(query)
+    query.set_sources([str(directory)])
+    query.set_limit(5)
+    wait()
+
+    query.on_count_error(query.count_token, "disk on fire")
+
+    assert not query.is_count_exact()
+    assert "Count: disk on fire" in query.get_errors()
+    assert selector.row_count_label.text().startswith("at least")
+    assert selector.page_count_label.text().startswith("out of at least")
+
+
+def test_failing_query_is_reported(app, wait, write_files):
+    directory = write_files({"a.parquet": {"label": ["x", "y"], "n": [1, 2]}})
+    query = Query()
+    query.set_sources([str(directory)])
+    wait()
+
+    assert query.get_aggregate_functions(["n"]) == list(AGGREGATES)
+    assert "avg" not in query.get_aggregate_functions(["label", "n"])
+
+    # Not offered for text, but the query must survive it all the same
+    query.set_group_by(["n"], [("avg", "label")])
+    wait()
+    assert query.get_errors()
+    assert not query.signalsBlocked()
+
+    query.set_group_by([], [])
+    wait()
+    assert not query.get_errors()
+    assert query.get_header() == ["run_name", "label", "n"]
+
+
+def test_refresh_keeps_pages_of_unchanged_files(app, wait, write_files):
+    directory = write_files({"a.parquet": {"n": [1, 2]}, "b.parquet": {"n": [3]}})
+    query = Query()
+    query.set_sources([str(directory / "a.parquet")])
+    wait()
+    kept = set(query.column_chunks)
+    query.set_sources([str(directory / "b.parquet")])
+    wait()
+
+    write_files({"b.parquet": {"n": [4, 5]}})
+    query.refresh_files()
+    wait()
+
+    assert kept <= set(query.column_chunks)
+    assert query.get_row_count_so_far() == 2
+    assert query.get_value(1, 1) == 5
+
+
+def test_sharded_count_ignores_previous_count(app, wait, write_files):
+    directory = write_files(
+        {f"{i:03}.parquet": {"n": list(range(50))} for i in range(140)}
+    )
+    query = Query()
+    query.set_sources([str(directory)])
+    query.set_sharded(True)
+    wait()
+
+    assert query.get_row_count_so_far() == 7000
+    assert _counts[query.count_query()] == 7000
+
+
+def test_sharded_kept_when_opening_another_dataset(app, wait, write_files):
+    directory = write_files({"a.parquet": {"n": [1]}, "b.parquet": {"n": [2]}})
+    query = Query()
+    query.set_sources([str(directory / "a.parquet")])
+    query.set_sharded(True)
+    query.set_sources([str(directory / "b.parquet")])
+    wait()
+
+    assert query.is_sharded()
+
+
+def test_sorted_page_without_some_columns(app, wait, write_files):
+    directory = write_files(
+        {
+            "a.parquet": {"id": [1, 2], "score": [1, 1]},
+            "b.parquet": {"id": [3, 4], "score": [0, 0], "extra": ["x", "y"]},
+        }
+    )
+    query = Query()
+    query.set_sources([str(directory)])
+    query.set_fields(["id", "score", "extra"])
+    query.set_limit(2)
+    query.set_order_by([("score", "DESC")])
+    wait()
+
+    assert not query.get_errors()
+    assert not query.signalsBlocked()
+    assert query.get_header() == ["run_name", "id", "score", "extra"]
+    assert query.get_value(0, 3) is None
+
+    query.set_page(2)
+    wait()
+    assert query.get_value(0, 3) == "x"
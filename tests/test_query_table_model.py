@@ -0,0 +1,127 @@
+import time
+import tracemalloc
+
+import PySide6.QtCore as qc
+
+from common_widgets.page_selector import MAX_ROWS_PER_PAGE
+from table.query_table_model import CACHE_SIZE, QueryTableModel
+
+# Budgets for a page of MAX_ROWS_PER_PAGE rows, well above what is measured on a laptop so that slow machines pass,
+# but far below what a page converted to Python objects as a whole would take
+UPDATE_SECONDS = 3.0
+UPDATE_PEAK_BYTES = 8 << 20
+SCREEN_SECONDS = 0.25
+DATA_PEAK_BYTES = 8 << 20
+HEADER_SECONDS = 0.5
+
+# Cells shown at once by a maximized table
+SCREEN_ROWS = 50
+
+DISPLAY = qc.Qt.ItemDataRole.DisplayRole
+
+
+def measure(fn, setup=lambda: None):
+    """Time it takes to run fn (in seconds), and peak memory it allocates in Python (in bytes)
+
+    fn is run twice, after setup each time: tracing memory would slow it down too much to time it as well.
+    """
+    setup()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def test_update_fetches_full_page(query):
+    # The columns of previous runs would make the update free
+    elapsed, peak = measure(query.update, query.column_chunks.clear)
+
+    assert query.get_row_count() == MAX_ROWS_PER_PAGE
+    assert query.get_column_count() == len(query.get_available_fields()) + 1
+    assert elapsed < UPDATE_SECONDS
+    assert peak < UPDATE_PEAK_BYTES
+
+
+def test_update_sorted_page(query):
+    query.set_order_by([("score", "DESC")])
+    query.set_page(2)
+    elapsed, peak = measure(query.update, query.column_chunks.clear)
+
+    assert query.get_row_count() == MAX_ROWS_PER_PAGE
+    scores = query.frame["score"]
+    assert scores.to_list() == scores.sort(descending=True).to_list()
+    assert elapsed < UPDATE_SECONDS
+    assert peak < UPDATE_PEAK_BYTES
+
+
+def test_update_after_scrolling_sorted_page(query):
+    """Columns scrolled to are fetched by row number, not by sorting the dataset again"""
+    query.set_order_by([("score", "DESC")])
+
+    def show_first_columns():
+        query.column_chunks.clear()
+        query.set_visible_columns(["id", "score"])
+
+    elapsed, peak = measure(
+        lambda: query.set_visible_columns(["label", "tags", "point"]),
+        show_first_columns,
+    )
+
+    header = query.get_header()
+    assert query.get_value(0, header.index("label")) == (
+        f"label {query.get_value(0, header.index('id'))}"
+    )
+    assert elapsed < UPDATE_SECONDS
+    assert peak < UPDATE_PEAK_BYTES
+
+
+def test_data_screen_latency(query):
+    model = QueryTableModel(query)
+    rows = range(MAX_ROWS_PER_PAGE - SCREEN_ROWS, MAX_ROWS_PER_PAGE)
+    columns = range(model.columnCount(qc.QModelIndex()))
+
+    def show_screen():
+        for row in rows:
+            for column in columns:
+                assert model.data(model.index(row, column), DISPLAY) is not None
+
+    elapsed, _ = measure(show_screen, model.cache.clear)
+    assert elapsed < SCREEN_SECONDS
+
+
+def test_data_memory_is_bounded(query):
+    """Formatted cells are cached, but only a few screens worth of them"""
+    model = QueryTableModel(query)
+    columns = [query.get_header().index(c) for c in ("label", "tags", "point")]
+    step = MAX_ROWS_PER_PAGE // CACHE_SIZE
+
+    def scroll_through_page():
+        for row in range(0, MAX_ROWS_PER_PAGE, step):
+            for column in columns:
+                model.data(model.index(row, column), DISPLAY)
+
+    _, peak = measure(scroll_through_page, model.cache.clear)
+    assert len(model.cache) <= CACHE_SIZE
+    assert peak < DATA_PEAK_BYTES
+
+
+def test_header_latency(query):
+    model = QueryTableModel(query)
+
+    def read_headers():
+        for section in range(model.columnCount(qc.QModelIndex())):
+            model.headerData(section, qc.Qt.Orientation.Horizontal, DISPLAY)
+        for section in range(model.rowCount(qc.QModelIndex())):
+            model.headerData(section, qc.Qt.Orientation.Vertical, DISPLAY)
+
+    elapsed, _ = measure(read_headers)
+    assert model.headerData(0, qc.Qt.Orientation.Horizontal, DISPLAY) == "run_name"
+    assert elapsed < HEADER_SECONDS
@@ -0,0 +1,116 @@
+import shutil
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import metadata
+import query as query_module
+import remote
+from commons import cache_dir
+from query import Query
+from range_http_server import RangeRequestHandler
+
+
+class CountingHandler(RangeRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        CountingHandler.requests.append((self.path, self.headers.get("Range")))
+        super().do_GET()
+
+
+@pytest.fixture
+def server(write_files):
+    """range_http_server serving a hive partitioned dataset, on an ephemeral port"""
+    directory = write_files({})
+    for year in (2020, 2021):
+        (directory / f"year={year}").mkdir()
+        write_files(
+            {
+                f"year={year}/{i}.parquet": {
+                    "id": list(range(i * 100, (i + 1) * 100)),
+                    "label": [f"label {n}" for n in range(100)],
+                }
+                for i in range(2)
+            }
+        )
+    httpd = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(CountingHandler, directory=str(directory))
+    )
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    shutil.rmtree(cache_dir("remote"))
+    remote._cache = None
+    CountingHandler.requests = []
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def urls(server):
+    return [
+        f"{server}/year={year}/{i}.parquet" for year in (2020, 2021) for i in range(2)
+    ]
+
+
+def forget_results(files):
+    """Drop what was computed in memory from these files, so only the block cache can spare requests"""
+    query_module.invalidate_cached_results(files)
+    metadata.invalidate(files)
+
+
+def test_remote_dataset(app, wait, server):
+    query = Query()
+    query.set_sources(urls(server))
+    wait()
+
+    assert query.get_row_count_so_far() == 400
+    assert query.get_value(0, query.get_header().index("id")) == 0
+
+    query.set_filters(["year = 2021"])
+    wait()
+    assert [str(f) for f in query.scanned_files] == urls(server)[2:]
+    assert query.get_row_count_so_far() == 200
+
+
+def test_second_open_uses_block_cache(app, wait, server):
+    query = Query()
+    query.set_sources(urls(server))
+    wait()
+    assert CountingHandler.requests
+
+    forget_results(urls(server))
+    CountingHandler.requests = []
+    query = Query()
+    query.set_sources(urls(server))
+    wait()
+
+    assert query.get_row_count_so_far() == 400
+    assert query.get_value(0, query.get_header().index("id")) == 0
+    assert CountingHandler.requests == []
+
+
+def test_nearby_ranges_fetched_together(server, write_files):
+    blob = bytes(range(256)) * (5 * remote.BLOCK_SIZE // 256)
+    (write_files({}) / "blob.bin").write_bytes(blob)
+    url = f"{server}/blob.bin"
+    first = (0, 10)
+    last = (
+        remote.COALESCE_GAP * remote.BLOCK_SIZE + 5,
+        remote.COALESCE_GAP * remote.BLOCK_SIZE + 20,
+    )
+
+    assert remote.read_ranges(url, [first, last]) == [
+        blob[slice(*first)],
+        blob[slice(*last)],
+    ]
+    assert len(CountingHandler.requests) == 1
+
+    remote.read_ranges(url, [first, last])
+    assert len(CountingHandler.requests) == 1
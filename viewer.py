@@ -1,24 +1,26 @@
 #!/usr/bin/env python
 
 
-import json
 from pathlib import Path
 
 import PySide6.QtCore as qc
 import PySide6.QtGui as qg
 import PySide6.QtWidgets as qw
 
+import engine
 from fields.fields_widget import FieldsWidget
 from query import Query
+from sessions import SessionStore
 from table.query_table_widget import QueryTableWidget
 
 
-class MainWindow(qw.QMainWindow):
+class SessionWidget(qw.QWidget):
+    """One tab of the main window, with its own query"""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, query: Query, parent=None):
+        super().__init__(parent)
 
-        self.query = Query()
+        self.query = query
 
         self.fields_widget = FieldsWidget(self.query)
         self.query_table_widget = QueryTableWidget(self.query)
@@ -28,20 +30,183 @@ class MainWindow(qw.QMainWindow):
         self.splitter.addWidget(self.fields_widget)
         self.splitter.addWidget(self.query_table_widget)
 
-        self.setCentralWidget(self.splitter)
+        layout = qw.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.splitter)
+        self.setLayout(layout)
+
+    def title(self) -> str:
+        sources = self.query.get_sources()
+        if not sources:
+            return "New tab"
+        if len(sources) > 1:
+            return f"{Path(sources[0]).name} (+{len(sources) - 1})"
+        return Path(sources[0]).name
+
+
+class MainWindow(qw.QMainWindow):
+
+    def __init__(self):
+        super().__init__()
+
+        # Every tab has its own Query, but they all share the same DuckDB database, metadata and caches
+        self.tabs = qw.QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
+        self.tabs.currentChanged.connect(self.on_current_tab_changed)
+
+        self.setCentralWidget(self.tabs)
+
+        self.sessions = SessionStore(
+            Path(
+                qc.QStandardPaths().writableLocation(
+                    qc.QStandardPaths.StandardLocation.AppDataLocation
+                )
+            )
+        )
+        # Preferences are written in one go, a little after they change
+        self.save_timer = qc.QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(2000)
+        self.save_timer.timeout.connect(self.sessions.save)
 
         self.menu = self.menuBar()
         self.file_menu = self.menu.addMenu("File")
+        self.new_tab_action = self.file_menu.addAction("New tab")
+        self.new_tab_action.setShortcut(qg.QKeySequence.StandardKey.AddTab)
+        self.new_tab_action.triggered.connect(lambda: self.add_tab())
         self.open_action = self.file_menu.addAction("Open")
         self.open_action.triggered.connect(self.open_file)
+        self.open_directory_action = self.file_menu.addAction("Open directory")
+        self.open_directory_action.triggered.connect(self.open_directory)
+        self.open_glob_action = self.file_menu.addAction("Open glob pattern")
+        self.open_glob_action.triggered.connect(self.open_glob)
+        self.open_url_action = self.file_menu.addAction("Open URL")
+        self.open_url_action.triggered.connect(self.open_url)
+        self.recent_menu = self.file_menu.addMenu("Recent datasets")
+        self.recent_menu.aboutToShow.connect(self.populate_recent_menu)
+
+        self.session_menu = self.menu.addMenu("Sessions")
+        self.save_session_action = self.session_menu.addAction("Save session as...")
+        self.save_session_action.triggered.connect(self.save_session_as)
+        self.open_session_menu = self.session_menu.addMenu("Open session")
+        self.open_session_menu.aboutToShow.connect(self.populate_session_menu)
+        self.delete_session_menu = self.session_menu.addMenu("Delete session")
+        self.delete_session_menu.aboutToShow.connect(self.populate_session_menu)
+
+        self.query_menu = self.menu.addMenu("Query")
+        self.sharded_action = self.query_menu.addAction(
+            "Split large datasets in shards"
+        )
+        self.sharded_action.setCheckable(True)
+        self.sharded_action.toggled.connect(
+            lambda checked: self.current_query().set_sharded(checked)
+        )
 
         self.load_previous_session()
 
+    def add_tab(self, query_dict: dict = None) -> SessionWidget:
+        query = Query()
+        session = SessionWidget(query)
+        query.query_changed.connect(lambda: self.update_tab_title(session))
+        index = self.tabs.addTab(session, session.title())
+        self.tabs.setCurrentIndex(index)
+        if query_dict:
+            # Files are looked for in the background, so the window shows up right away
+            query.from_dict(query_dict, lazy=True)
+        return session
+
+    def close_tab(self, index: int):
+        session = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        session.deleteLater()
+        if not self.tabs.count():
+            self.add_tab()
+
+    def update_tab_title(self, session: SessionWidget):
+        index = self.tabs.indexOf(session)
+        if index >= 0:
+            self.tabs.setTabText(index, session.title())
+
+    def on_current_tab_changed(self, index: int):
+        # Background work of the visible tab runs before that of the other tabs
+        for i in range(self.tabs.count()):
+            self.tabs.widget(i).query.set_priority(
+                engine.VISIBLE_PRIORITY if i == index else engine.BACKGROUND_PRIORITY
+            )
+        if index >= 0:
+            self.sharded_action.blockSignals(True)
+            self.sharded_action.setChecked(self.current_query().is_sharded())
+            self.sharded_action.blockSignals(False)
+
+    def current_query(self) -> Query:
+        return self.tabs.currentWidget().query
+
     def load_previous_session(self):
-        prefs = self.get_user_prefs()
-        if "query" not in prefs:
-            return
-        self.query.from_dict(prefs["query"])
+        self.load_session(self.sessions.current)
+
+    def load_session(self, name: str):
+        while self.tabs.count():
+            session = self.tabs.widget(0)
+            self.tabs.removeTab(0)
+            session.deleteLater()
+        session = self.sessions.get_session(name)
+        for query_dict in session["tabs"]:
+            self.add_tab(query_dict)
+        if not self.tabs.count():
+            self.add_tab()
+        self.tabs.setCurrentIndex(min(session["current_tab"], self.tabs.count() - 1))
+        self.sessions.current = name
+        self.setWindowTitle(f"ParquetViewer - {name}")
+
+    def store_current_session(self):
+        self.sessions.set_session(
+            self.sessions.current,
+            [self.tabs.widget(i).query.to_dict() for i in range(self.tabs.count())],
+            self.tabs.currentIndex(),
+        )
+
+    def save_session_as(self):
+        name, ok = qw.QInputDialog.getText(
+            self, "Save session as", "Name", text=self.sessions.current
+        )
+        if ok and name:
+            self.sessions.current = name
+            self.store_current_session()
+            self.setWindowTitle(f"ParquetViewer - {name}")
+            self.sessions.save()
+
+    def open_session(self, name: str):
+        self.store_current_session()
+        self.load_session(name)
+        self.save_timer.start()
+
+    def delete_session(self, name: str):
+        self.sessions.remove_session(name)
+        self.save_timer.start()
+
+    def populate_session_menu(self):
+        self.open_session_menu.clear()
+        self.delete_session_menu.clear()
+        for name in self.sessions.session_names():
+            action = self.open_session_menu.addAction(name)
+            action.triggered.connect(lambda _=False, n=name: self.open_session(n))
+            if name != self.sessions.current:
+                action = self.delete_session_menu.addAction(name)
+                action.triggered.connect(lambda _=False, n=name: self.delete_session(n))
+
+    def populate_recent_menu(self):
+        self.recent_menu.clear()
+        for sources in self.sessions.recent:
+            label = ", ".join(sources)
+            action = self.recent_menu.addAction(label)
+            action.triggered.connect(lambda _=False, s=sources: self.open_sources(s))
+
+    def open_sources(self, sources):
+        self.sessions.add_recent(sources)
+        self.save_timer.start()
+        self.current_query().set_sources(sources)
 
     def open_file(self):
         last_open_files = self.get_user_prefs().get("last_files", None)
@@ -57,41 +222,53 @@ class MainWindow(qw.QMainWindow):
         )
         if files:
             self.save_user_prefs({"last_files": files})
-            self.query.set_files([Path(f) for f in files])
+            self.open_sources(files)
 
-    def closeEvent(self, event: qg.QCloseEvent):
-        self.save_user_prefs({"query": self.query.to_dict()})
-        event.accept()
+    def open_directory(self):
+        last_open_files = self.get_user_prefs().get("last_files", None)
+        if not last_open_files:
+            d = Path().home()
+        else:
+            d = Path(last_open_files[0]).parent
+        directory = qw.QFileDialog.getExistingDirectory(
+            self, "Open Parquet dataset", dir=str(d)
+        )
+        if directory:
+            self.save_user_prefs({"last_files": [str(Path(directory) / "*")]})
+            self.open_sources([directory])
 
-    def save_user_prefs(self, prefs: dict):
+    def open_glob(self):
+        pattern, ok = qw.QInputDialog.getText(
+            self,
+            "Open glob pattern",
+            "Parquet files matching (e.g. /data/**/*.parquet)",
+        )
+        if ok and pattern:
+            self.save_user_prefs({"last_files": [pattern]})
+            self.open_sources([pattern])
 
-        user_prefs = Path(
-            qc.QStandardPaths().writableLocation(
-                qc.QStandardPaths.StandardLocation.AppDataLocation
-            )
+    def open_url(self):
+        urls, ok = qw.QInputDialog.getMultiLineText(
+            self,
+            "Open URL",
+            "Parquet files URLs (http://, https:// or s3://), one per line",
         )
-        user_prefs.mkdir(parents=True, exist_ok=True)
-        old_prefs = {}
-        if (user_prefs / "config.json").exists():
-            with open(user_prefs / "config.json", "r") as f:
-                old_prefs = json.load(f)
+        urls = [u.strip() for u in urls.splitlines() if u.strip()]
+        if ok and urls:
+            self.open_sources(urls)
 
-        old_prefs.update(prefs)
+    def closeEvent(self, event: qg.QCloseEvent):
+        self.save_timer.stop()
+        self.store_current_session()
+        self.sessions.save()
+        event.accept()
 
-        with open(user_prefs / "config.json", "w") as f:
-            json.dump(old_prefs, f)
+    def save_user_prefs(self, prefs: dict):
+        self.sessions.prefs.update(prefs)
+        self.save_timer.start()
 
     def get_user_prefs(self):
-        user_prefs = Path(
-            qc.QStandardPaths().writableLocation(
-                qc.QStandardPaths.StandardLocation.AppDataLocation
-            )
-        )
-        prefs = {}
-        if (user_prefs / "config.json").exists():
-            with open(user_prefs / "config.json", "r") as f:
-                prefs = json.load(f)
-        return prefs
+        return self.sessions.prefs
 
 
 if __name__ == "__main__":